@@ -133,6 +133,42 @@ DJOSER = {
 
 AUTH_USER_MODEL = 'properties.User'
 
+# How long (seconds) a make-payment Idempotency-Key response is replayed for
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# sync/ cursors trail the clock by this many seconds so writes still committing are not skipped
+SYNC_CURSOR_LAG = 30
+
+# Server-sent events at /api/properties/events/ (served by backend/asgi.py).
+# Use 'properties.events.RedisBackend' with EVENTS_REDIS_URL when running several processes.
+EVENTS_BACKEND = 'properties.events.LocalBackend'
+EVENTS_KEEPALIVE = 15
+
+# Deleting a property, payment plan or user hides it at once and removes its
+# dependents in chunks in the background (see properties/deletion.py)
+ASYNC_DELETION = True
+DELETION_CHUNK_SIZE = 500
+DELETION_RUN_IN_THREAD = True  # Set to False when `manage.py process_deletions` runs the jobs instead
+
+# Payment plan statement exports are cached until a payment on the plan changes
+STATEMENT_CACHE_TIMEOUT = 60 * 60
+STATEMENT_CACHE_MAX_ROWS = 5000
+
+# `manage.py archive_payments` moves settled payments older than this into the archive table
+PAYMENT_ARCHIVE_AFTER_DAYS = 365
+PAYMENT_ARCHIVE_BATCH_SIZE = 1000
+
+# Pre-rendered listing pages, rebuilt SNAPSHOT_DEBOUNCE seconds after a property changes.
+# A front-end server can serve SNAPSHOT_ROOT/current/ directly and fall back to Django when a file is missing.
+SNAPSHOT_ROOT = os.path.join(BASE_DIR, 'snapshots')
+SNAPSHOT_PAGE_SIZE = 50
+SNAPSHOT_DEBOUNCE = 5
+SNAPSHOT_KEEP_VERSIONS = 3
+
+# Limits for ?ids= multi-gets and the batch/ endpoint
+MULTI_GET_MAX_IDS = 100
+BATCH_MAX_REQUESTS = 20
+
 
 
 
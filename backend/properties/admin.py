@@ -1,9 +1,121 @@
+from decimal import Decimal
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.functional import cached_property
+
 from .models import Property, PaymentPlan, User, PaymentPlan, Payment
+from .events import hub
 
 
-admin.site.register(Property)
-admin.site.register(PaymentPlan)
-admin.site.register(User)
-admin.site.register(Payment)
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATE_THRESHOLD = 100000
+
+
+def estimated_row_count(model):
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        elif connection.vendor == 'sqlite':
+            # Rows are never renumbered, so the largest rowid is a close upper bound
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return 0
+        row = cursor.fetchone()
+    return max(row[0] or 0, 0) if row else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    # An unfiltered changelist of a large table shows the planner's row estimate instead of COUNT(*)
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where == queryset.model._default_manager.all().query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Property)
+class PropertyAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'listing_type', 'property_status', 'price', 'location', 'date_posted')
+    list_filter = ('listing_type', 'property_status')
+    date_hierarchy = 'date_posted'
+    search_fields = ('id__exact', 'title__exact')
+    ordering = ('-date_posted',)
+
+
+@admin.register(PaymentPlan)
+class PaymentPlanAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'property', 'plan_type', 'total_amount', 'amount_paid', 'next_due_date', 'created_at')
+    list_select_related = ('user', 'property')
+    list_filter = ('plan_type',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user', 'property')
+    search_fields = ('id__exact', 'user__username__exact', 'user__email__exact')
+    ordering = ('-created_at',)
 
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('id', 'payment_plan', 'amount', 'method', 'status', 'reference', 'payment_date')
+    list_select_related = ('payment_plan__user', 'payment_plan__property')
+    list_filter = ('status', 'method')
+    date_hierarchy = 'payment_date'
+    raw_id_fields = ('payment_plan',)
+    search_fields = ('id__exact', 'reference__exact', 'payment_plan__id__exact', 'payment_plan__user__username__exact')
+    ordering = ('-payment_date',)
+    actions = ('mark_successful', 'mark_pending', 'mark_failed')
+
+    @admin.action(description="Mark selected payments as successful")
+    def mark_successful(self, request, queryset):
+        self.set_status(request, queryset, 'successful')
+
+    @admin.action(description="Mark selected payments as pending")
+    def mark_pending(self, request, queryset):
+        self.set_status(request, queryset, 'pending')
+
+    @admin.action(description="Mark selected payments as failed")
+    def mark_failed(self, request, queryset):
+        self.set_status(request, queryset, 'failed')
+
+    def set_status(self, request, queryset, status):
+        # One UPDATE for the payments and one for their plans' amount_paid, instead of Payment.save() per row;
+        # bumping updated_at also retires the plans' cached statements
+        payment_ids = list(queryset.values_list('id', flat=True))
+        plan_ids = list(queryset.values_list('payment_plan_id', flat=True).distinct())
+        updated = queryset.update(status=status)
+
+        paid = (
+            Payment.objects.filter(payment_plan=OuterRef('pk'), status='successful')
+            .values('payment_plan').annotate(total=Sum('amount')).values('total')
+        )
+        PaymentPlan.all_objects.filter(pk__in=plan_ids).update(
+            amount_paid=F('archived_paid') + Coalesce(Subquery(paid), Value(Decimal(0)), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            updated_at=timezone.now(),
+        )
+
+        # update() skips post_save, so dashboards are sent the payment.updated events here
+        events = list(Payment.objects.filter(pk__in=payment_ids).values('id', 'payment_plan', 'amount', 'method', 'status', 'payment_date'))
+
+        def publish():
+            for data in events:
+                hub.publish('payment.updated', data)
+        transaction.on_commit(publish)
+
+        self.message_user(request, f"{updated} payment(s) marked as {status}.")
+
+
+admin.site.register(User)
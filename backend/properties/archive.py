@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Payment, PaymentPlan, ArchivedPayment
+
+
+SETTLED_STATUSES = ('successful', 'failed')
+ARCHIVED_FIELDS = ('id', 'payment_plan_id', 'amount', 'payment_date', 'method', 'reference', 'status')
+
+
+def archive_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, 'PAYMENT_ARCHIVE_AFTER_DAYS', 365))
+
+
+def archive_horizon():
+    # payment_date of the newest archived payment, or None while the archive is empty. Read from
+    # the database every time (an index lookup) so every process sees an archive run at once
+    return ArchivedPayment.objects.aggregate(newest=Max('payment_date'))['newest']
+
+
+def reaches_archive(start):
+    horizon = archive_horizon()
+    return horizon is not None and start is not None and start <= horizon
+
+
+def payments_in_range(start=None, end=None, **filters):
+    """Payments matching filters, split into (hot, archived) querysets.
+
+    archived is None unless start reaches back into the archive, so requests
+    for recent payments never touch the archive table.
+    """
+    date_filters = {}
+    if start is not None:
+        date_filters['payment_date__gte'] = start
+    if end is not None:
+        date_filters['payment_date__lt'] = end
+
+    hot = Payment.objects.filter(**filters, **date_filters)
+    archived = None
+    if reaches_archive(start):
+        archived = ArchivedPayment.objects.filter(**filters, **date_filters)
+    return hot, archived
+
+
+def archive_payments(cutoff=None, batch_size=None, max_batches=None):
+    """Move settled payments older than cutoff into ArchivedPayment, a batch per transaction.
+
+    Each plan's archived_paid grows by the successful amount moved, so
+    amount_paid and the balance do not change, and its archived counts by
+    the payments moved. Returns the number moved.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or getattr(settings, 'PAYMENT_ARCHIVE_BATCH_SIZE', 1000)
+    moved = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            candidates = Payment.objects.select_for_update().filter(payment_date__lt=cutoff, status__in=SETTLED_STATUSES)
+            ids = list(candidates.order_by('payment_date', 'id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+
+            rows = list(Payment.objects.filter(id__in=ids).values(*ARCHIVED_FIELDS))
+            ArchivedPayment.objects.bulk_create([ArchivedPayment(**row) for row in rows])
+
+            settled = Payment.objects.filter(id__in=ids).values('payment_plan_id').annotate(
+                paid=Sum('amount', filter=Q(status='successful')),
+                successful=Count('id', filter=Q(status='successful')),
+                failed=Count('id', filter=Q(status='failed')),
+            )
+            now = timezone.now()
+            for plan in settled:
+                PaymentPlan.all_objects.filter(pk=plan['payment_plan_id']).update(
+                    archived_paid=F('archived_paid') + (plan['paid'] or 0),
+                    archived_successful_count=F('archived_successful_count') + plan['successful'],
+                    archived_failed_count=F('archived_failed_count') + plan['failed'],
+                    updated_at=now,
+                )
+
+            # The plans were touched once above, so skip the per-row post_delete signal
+            moved_rows = Payment.objects.filter(id__in=ids)
+            moved_rows._raw_delete(moved_rows.db)
+
+        moved += len(ids)
+        batches += 1
+
+    return moved
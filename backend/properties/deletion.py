@@ -0,0 +1,130 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Property, PaymentPlan, Payment, ArchivedPayment, User, DeletionJob, IdempotencyKey, Tombstone
+from .snapshots import schedule_rebuild
+
+
+def chunk_size():
+    return getattr(settings, 'DELETION_CHUNK_SIZE', 500)
+
+
+def exclude_scheduled_users(users):
+    # User has no deleted_at; a user with a deletion job is hidden until the job removes them
+    return users.exclude(Exists(DeletionJob.objects.filter(model_name='user', object_id=OuterRef('pk'))))
+
+
+def schedule_deletion(obj):
+    """Hide obj straight away and queue its removal.
+
+    Dependent payment plans are hidden too. The rows themselves, and the
+    payments under them, are deleted later in bounded chunks by run_job().
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if isinstance(obj, User):
+            model_name = 'user'
+            User.objects.filter(pk=obj.pk).update(is_active=False)
+            plans = PaymentPlan.objects.filter(user=obj)
+        elif isinstance(obj, Property):
+            model_name = 'property'
+            Property.objects.filter(pk=obj.pk).update(deleted_at=now, updated_at=now)
+            Tombstone.objects.create(model_name='property', object_id=obj.pk, deleted_at=now)
+            # update() skips the post_save signal that would normally refresh the listing snapshots
+            transaction.on_commit(schedule_rebuild)
+            plans = PaymentPlan.objects.filter(property=obj)
+        else:
+            model_name = 'paymentplan'
+            plans = PaymentPlan.objects.filter(pk=obj.pk)
+
+        Tombstone.objects.bulk_create([
+            Tombstone(model_name='paymentplan', object_id=plan_id, user_id=user_id, deleted_at=now)
+            for plan_id, user_id in plans.values_list('id', 'user_id')
+        ])
+        plans.update(deleted_at=now, updated_at=now)
+
+        job = DeletionJob.objects.create(model_name=model_name, object_id=obj.pk)
+
+    if getattr(settings, 'DELETION_RUN_IN_THREAD', True):
+        transaction.on_commit(lambda: threading.Thread(target=run_job, args=(job.pk,), daemon=True).start())
+    return job
+
+
+def run_job(job_id):
+    # Claim the job so a worker thread and process_deletions never run it twice
+    claimed = DeletionJob.objects.filter(pk=job_id, status='pending').update(status='running', updated_at=timezone.now())
+    if not claimed:
+        return
+    job = DeletionJob.objects.get(pk=job_id)
+    try:
+        _delete_in_chunks(job)
+    except Exception as exc:
+        job.status = 'failed'
+        job.error = str(exc)
+        job.save(update_fields=['status', 'deleted', 'error', 'updated_at'])
+    else:
+        job.status = 'done'
+        job.save(update_fields=['status', 'deleted', 'updated_at'])
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def process_pending_jobs(stale_after=timedelta(minutes=10), retry_failed=False):
+    # Requeue jobs whose worker died part way through, then run everything pending
+    stale = timezone.now() - stale_after
+    DeletionJob.objects.filter(status='running', updated_at__lt=stale).update(status='pending')
+    if retry_failed:
+        DeletionJob.objects.filter(status='failed').update(status='pending', error='')
+    job_ids = list(DeletionJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True))
+    for job_id in job_ids:
+        run_job(job_id)
+    return len(job_ids)
+
+
+def _delete_in_chunks(job):
+    if job.model_name == 'user':
+        plans = PaymentPlan.all_objects.filter(user_id=job.object_id)
+        owner = User.objects.filter(pk=job.object_id)
+    elif job.model_name == 'property':
+        plans = PaymentPlan.all_objects.filter(property_id=job.object_id)
+        owner = Property.all_objects.filter(pk=job.object_id)
+    else:
+        plans = PaymentPlan.all_objects.filter(pk=job.object_id)
+        owner = None
+
+    payments = Payment.objects.filter(payment_plan__in=plans)
+    archived = ArchivedPayment.objects.filter(payment_plan__in=plans)
+    keys = IdempotencyKey.objects.filter(payment_plan__in=plans)
+    job.total = payments.count() + archived.count() + keys.count() + plans.count() + (1 if owner is not None else 0)
+    job.save(update_fields=['total', 'updated_at'])
+
+    # Leaves first, so that deleting each chunk never cascades into more rows
+    for queryset in (payments, archived, keys, plans):
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list('id', flat=True)[:chunk_size()])
+                if not ids:
+                    break
+                chunk = queryset.model._base_manager.filter(id__in=ids)
+                if queryset.model is Payment:
+                    # Retires the plans' cached statements once per chunk instead of once per payment
+                    PaymentPlan.all_objects.filter(pk__in=chunk.values('payment_plan_id')).update(updated_at=timezone.now())
+                if queryset.model is PaymentPlan:
+                    chunk.delete()
+                else:
+                    # Leaf rows have no dependents, so skip loading them for the per-row post_delete signals
+                    chunk._raw_delete(chunk.db)
+                job.deleted += len(ids)
+                job.save(update_fields=['deleted', 'updated_at'])
+
+    if owner is not None:
+        with transaction.atomic():
+            owner.delete()
+            job.deleted += 1
+            job.save(update_fields=['deleted', 'updated_at'])
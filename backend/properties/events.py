@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    # One connected client: a bounded queue drained by its own event loop
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client, drop rather than buffer without limit
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class EventHub:
+    """In-process publish/subscribe hub.
+
+    Publishing goes through the configured backend so that events raised in
+    one process reach subscribers held by every other process.
+    """
+
+    def __init__(self, backend_path=None, queue_size=100):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._backend = None
+        self._backend_path = backend_path
+        self.queue_size = queue_size
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            path = self._backend_path or getattr(settings, 'EVENTS_BACKEND', 'properties.events.LocalBackend')
+            self._backend = import_string(path)(self)
+        return self._backend
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        self.backend.publish({'type': event_type, 'data': data})
+
+    def deliver(self, event):
+        # Called by the backend, possibly from a thread that is not the subscriber's loop
+        event = dict(event, id=next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Its event loop has shut down
+                self.unsubscribe(subscription)
+
+
+class LocalBackend:
+    # Delivers only to subscribers in this process
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, event):
+        self.hub.deliver(event)
+
+
+class RedisBackend:
+    # Fans events out to every process through a Redis pub/sub channel
+    def __init__(self, hub):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBackend requires the 'redis' package.")
+        self.hub = hub
+        self.channel = getattr(settings, 'EVENTS_REDIS_CHANNEL', 'properties-events')
+        self.client = redis.Redis.from_url(getattr(settings, 'EVENTS_REDIS_URL', 'redis://localhost:6379/0'))
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Only processes holding subscribers need to listen
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='events-redis-listener', daemon=True)
+                self._listener.start()
+
+    def publish(self, event):
+        self.client.publish(self.channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            self.hub.deliver(json.loads(message['data']))
+
+
+hub = EventHub()
+
+
+def format_event(event):
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+
+
+def request_fingerprint(amount, method, reference):
+    # 10 and 10.00 are the same payment
+    value = f"{Decimal(amount).quantize(Decimal('0.01'))}|{method}|{reference or ''}"
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def get_stored_response(user, key):
+    # Returns the live IdempotencyKey for this user/key, or None if unknown or expired
+    cutoff = timezone.now() - key_ttl()
+    return IdempotencyKey.objects.filter(user=user, key=key, created_at__gte=cutoff).first()
+
+
+def claim_key(user, key, payment_plan, fingerprint):
+    """Reserve key for a payment that is about to be made, inside the caller's transaction.
+
+    Returns the new IdempotencyKey, or None when another request already
+    holds the key. The row only becomes visible, with its response filled in
+    by record_response(), when the payment commits; a concurrent insert of
+    the same key waits on the unique constraint and then fails here.
+    """
+    # An expired row for the same key would otherwise block the claim until the next purge
+    IdempotencyKey.objects.filter(user=user, key=key, created_at__lt=timezone.now() - key_ttl()).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                payment_plan=payment_plan,
+                request_fingerprint=fingerprint,
+                response_status=202,
+                response_body={},
+            )
+    except IntegrityError:
+        return None
+
+
+def record_response(claim, response_status, response_body):
+    # Stored as rendered, so a replay returns exactly what the first call did (Decimals as numbers)
+    claim.response_status = response_status
+    claim.response_body = json.loads(JSONRenderer().render(response_body))
+    claim.save(update_fields=['response_status', 'response_body'])
+
+
+def purge_expired_keys():
+    cutoff = timezone.now() - key_ttl()
+    return IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()[0]
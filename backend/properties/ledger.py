@@ -0,0 +1,127 @@
+import csv
+import heapq
+import itertools
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .archive import archive_horizon
+from .models import PaymentPlan, Payment, ArchivedPayment
+
+
+CENTS = Decimal('0.01')
+LEDGER_FIELDS = ('id', 'payment_date', 'amount', 'method', 'reference', 'status')
+
+
+def successful_amount():
+    return Case(When(status='successful', then=F('amount')), default=Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def ledger_queryset(model, plan):
+    return model.objects.filter(payment_plan=plan).order_by('payment_date', 'id')
+
+
+def merge_ledger(*streams):
+    # Archived rows keep their original ids, so (payment_date, id) orders both tables as one
+    return heapq.merge(*streams, key=lambda row: (row['payment_date'], row['id']))
+
+
+def ledger_page(plan, after=None, start=None, end=None, page_size=50):
+    """One page of the plan's ledger, oldest first, from start up to (not including) end.
+
+    Hot and archived payments are merged by date, as pending or backdated
+    payments stay in the hot table while newer ones are archived. The
+    total carried in from earlier payments comes from one aggregate per
+    table, so late pages cost the same as early ones. The archive is only
+    read when the page starts at or before its newest payment.
+    """
+    lower = after.payment_date if after is not None else start
+    horizon = archive_horizon()
+    read_archive = horizon is not None and (lower is None or lower <= horizon)
+
+    earlier = Q()
+    if after is not None:
+        earlier = Q(payment_date__lt=after.payment_date) | Q(payment_date=after.payment_date, id__lte=after.id)
+    elif start is not None:
+        earlier = Q(payment_date__lt=start)
+
+    # Every archived payment precedes the page when it starts after the horizon
+    opening = Decimal(0) if read_archive else plan.archived_paid
+    pages = []
+    for model in ((Payment, ArchivedPayment) if read_archive else (Payment,)):
+        page = ledger_queryset(model, plan)
+        if earlier:
+            opening += model.objects.filter(payment_plan=plan).filter(earlier).aggregate(total=Sum(successful_amount()))['total'] or 0
+            page = page.exclude(earlier)
+        if end is not None:
+            page = page.filter(payment_date__lt=end)
+        pages.append([dict(row, archived=model is ArchivedPayment) for row in page.values(*LEDGER_FIELDS)[:page_size + 1]])
+
+    rows = list(itertools.islice(merge_ledger(*pages), page_size + 1))
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    paid = opening
+    for row in rows:
+        if row['status'] == 'successful':
+            paid += row['amount']
+        row['paid_to_date'] = Decimal(paid).quantize(CENTS)
+        row['balance'] = plan.total_amount - row['paid_to_date']
+    return {
+        'opening_balance': (plan.total_amount - opening).quantize(CENTS),
+        'entries': rows,
+        'next': rows[-1]['id'] if has_more else None,
+    }
+
+
+def statement_cache_key(plan):
+    # The plan's updated_at moves with every payment change, committed together with it, so
+    # every process switches to a new key once the change is visible and never before
+    return f'statement:{plan.pk}:{plan.updated_at.timestamp()}'
+
+
+def invalidate_statement(plan_id):
+    # For changes that do not save the plan themselves; runs in the caller's transaction
+    PaymentPlan.all_objects.filter(pk=plan_id).update(updated_at=timezone.now())
+
+
+class Echo:
+    # File-like object that hands each csv row straight back to the caller
+    def write(self, value):
+        return value
+
+
+def statement_csv(plan):
+    """Yield the statement as CSV lines, from the cache when it is still current.
+
+    A freshly generated statement is cached once it has been streamed in
+    full, provided it is not larger than STATEMENT_CACHE_MAX_ROWS.
+    """
+    key = statement_cache_key(plan)
+    cached = cache.get(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    max_rows = getattr(settings, 'STATEMENT_CACHE_MAX_ROWS', 5000)
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(['date', 'reference', 'method', 'status', 'amount', 'paid_to_date', 'balance'])]
+    yield lines[0]
+    # The statement is the whole history, hot and archived payments merged by date
+    streams = [ledger_queryset(model, plan).values(*LEDGER_FIELDS).iterator(chunk_size=2000) for model in (ArchivedPayment, Payment)]
+    paid = Decimal(0)
+    for row in merge_ledger(*streams):
+        if row['status'] == 'successful':
+            paid += row['amount']
+        paid_to_date = paid.quantize(CENTS)
+        line = writer.writerow([row['payment_date'].isoformat(), row['reference'] or '', row['method'], row['status'], row['amount'], paid_to_date, plan.total_amount - paid_to_date])
+        if lines is not None:
+            lines.append(line)
+            if len(lines) > max_rows:
+                lines = None
+        yield line
+
+    if lines is not None:
+        cache.set(key, lines, timeout=getattr(settings, 'STATEMENT_CACHE_TIMEOUT', 60 * 60))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from properties.archive import archive_payments
+
+
+class Command(BaseCommand):
+    help = "Moves settled payments older than PAYMENT_ARCHIVE_AFTER_DAYS into the archive table in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive payments older than this many days instead.")
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--max-batches', type=int, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days']) if options['days'] is not None else None
+        moved = archive_payments(cutoff=cutoff, batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(f"Archived {moved} payment(s).")
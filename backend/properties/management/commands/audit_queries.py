@@ -0,0 +1,274 @@
+import json
+import re
+from collections import Counter
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment, override_settings
+from django.urls import URLPattern, URLResolver
+from rest_framework.test import APIClient
+
+from properties import urls as properties_urls
+from properties.models import Property, PaymentPlan, Payment, User, DeletionJob
+
+
+URL_PREFIX = '/api/properties/'
+FINDING_KINDS = ('error', 'full_scan', 'missing_index', 'n_plus_one', 'unbounded')
+# Aggregates without GROUP BY return one row, e.g. SELECT COUNT(*) or SELECT (CAST(SUM(...) AS NUMERIC))
+AGGREGATE = re.compile(r'SELECT\s+(?:(?:CAST|COALESCE)?\(\s*)*(?:COUNT|SUM|MAX|MIN|AVG)\(')
+
+# Request bodies for the write routes, keyed by view name and method
+PAYLOADS = {
+    ('make_payment', 'post'): {'amount': '10', 'method': 'card'},
+    ('PropertyUploadView', 'post'): {'title': 'Audit upload', 'price': '1000', 'rooms': 2},
+    ('edit_property', 'put'): {'title': 'Audit edit'},
+    ('register_user', 'post'): {'username': 'audit-new', 'email': 'audit-new@example.com', 'phone_number': '1', 'password': 'audit-pass'},
+    ('login_user', 'post'): {'username': 'audit-staff', 'password': 'audit-pass'},
+    ('ObtainAuthToken', 'post'): {'username': 'audit-staff', 'password': 'audit-pass'},
+    ('reset_password', 'post'): {'email': 'audit-staff@example.com'},
+}
+
+# Routes that would invalidate the audit client's own credentials
+SKIP = {('logout_user', 'post'), ('UsersList', 'delete')}
+
+# Exports that stream a whole history by design, so unbounded reads are expected
+UNBOUNDED_BY_DESIGN = {'payment_plan_statement'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Calls every route in properties/urls.py against seeded data inside a rolled back transaction, "
+        "EXPLAINs each statement and reports server errors, full scans, missing indexes, N+1 patterns and unbounded queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=50, help="Number of properties to seed.")
+        parser.add_argument('--n-plus-one-threshold', type=int, default=3, help="Repeats of one statement shape in a request that count as N+1.")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--fail-on', default='', help=f"Comma separated finding kinds that make the command fail: {', '.join(FINDING_KINDS)}.")
+
+    def handle(self, *args, **options):
+        fail_on = {kind for kind in options['fail_on'].split(',') if kind}
+        unknown = fail_on - set(FINDING_KINDS)
+        if unknown:
+            raise CommandError(f"Unknown finding kind(s): {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        try:
+            with override_settings(DELETION_RUN_IN_THREAD=False), transaction.atomic():
+                report = self.audit(options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        for route in report['routes']:
+            kinds = Counter(finding['kind'] for finding in route['findings'])
+            summary = ', '.join(f"{count} {kind}" for kind, count in sorted(kinds.items())) or 'ok'
+            self.stdout.write(f"{route['method'].upper():6} {route['path']:60} {route['status']} {route['query_count']:3} queries  {summary}")
+        for path, method, reason in report['skipped']:
+            self.stdout.write(f"{method.upper():6} {path:60} skipped ({reason})")
+
+        failing = [f for route in report['routes'] for f in route['findings'] if f['kind'] in fail_on]
+        if failing:
+            raise CommandError(f"{len(failing)} finding(s) of kind {', '.join(sorted(fail_on))}.")
+
+    def audit(self, options):
+        ids = self.seed(options['properties'])
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(User.objects.get(pk=ids['user']))
+
+        routes, skipped = [], []
+        # Deletes last so every other route still finds its objects
+        requests = sorted(self.requests(ids), key=lambda r: r[1] == 'delete')
+        for path, method, view_name, reason in requests:
+            if reason:
+                skipped.append((path, method, reason))
+                continue
+            if (view_name, method) in SKIP:
+                skipped.append((path, method, 'changes the audit credentials'))
+                continue
+            if method not in ('get', 'delete') and (view_name, method) not in PAYLOADS:
+                skipped.append((path, method, 'no payload'))
+                continue
+
+            with CaptureQueriesContext(connection) as captured:
+                response = getattr(client, method)(path, PAYLOADS.get((view_name, method)), format='json')
+                # Streaming and file responses run their queries while the body is read; the
+                # test client closes them once it is consumed
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            statements = [q['sql'] for q in captured.captured_queries]
+            findings = self.analyse(statements, options['n_plus_one_threshold'])
+            if view_name in UNBOUNDED_BY_DESIGN:
+                findings = [finding for finding in findings if finding['kind'] != 'unbounded']
+            if response.status_code >= 500:
+                findings.insert(0, {'kind': 'error', 'status': response.status_code})
+            routes.append({
+                'path': path,
+                'method': method,
+                'view': view_name,
+                'status': response.status_code,
+                'query_count': len(statements),
+                'queries': statements,
+                'findings': findings,
+            })
+
+        return {'vendor': connection.vendor, 'routes': routes, 'skipped': skipped}
+
+    def seed(self, count):
+        password = 'audit-pass'
+        staff = User.objects.create_user(username='audit-staff', email='audit-staff@example.com', password=password, is_staff=True)
+        customers = [User.objects.create_user(username=f'audit-{i}', email=f'audit-{i}@example.com', password=password) for i in range(5)]
+        properties = Property.objects.bulk_create([
+            Property(title=f'Audit property {i}', price=Decimal(1000 + i), rooms=i % 6, listing_type='House', property_status='Sale')
+            for i in range(count)
+        ])
+        plans = PaymentPlan.objects.bulk_create([
+            PaymentPlan(user=customers[i % len(customers)], property=prop, plan_type='Instalment', total_amount=Decimal(100000), installments=12)
+            for i, prop in enumerate(properties) for _ in range(2)
+        ])
+        # On its own property so deleting the audited property leaves it visible
+        plans.append(PaymentPlan.objects.create(user=staff, property=properties[1], plan_type='Instalment', total_amount=Decimal(100000), installments=12))
+        payments = Payment.objects.bulk_create([
+            Payment(payment_plan=plan, amount=Decimal(10), method='card', status='successful')
+            for plan in plans for _ in range(5)
+        ])
+        job = DeletionJob.objects.create(model_name='property', object_id=properties[-1].pk, status='done')
+        return {
+            'user': staff.pk,
+            'property': properties[0].pk,
+            'plan': plans[-1].pk,
+            'payment': payments[0].pk,
+            'job': job.pk,
+        }
+
+    def requests(self, ids):
+        # Values for URL kwargs; 'pk' means a different model depending on the view
+        kwarg_values = {'pk': ids['property'], 'id': ids['user'], 'plan_id': ids['plan'], 'property_id': ids['property'], 'filter_set': 'all', 'page': 1}
+        pk_by_view = {
+            'UsersList': ids['user'],
+            'UserPaymentPlansView': ids['user'],
+            'UserViewSet': ids['user'],
+            'PaymentViewSet': ids['payment'],
+            'deletion_job': ids['job'],
+        }
+
+        for route, pattern in walk_patterns(properties_urls.urlpatterns):
+            names = re.findall(r'<(?:\w+:)?(\w+)>', route)
+            if 'format' in names:
+                continue
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is None:
+                yield URL_PREFIX + route, 'any', pattern.callback.__name__, 'not a REST framework view'
+                continue
+            view_name = view_class.__name__
+            if view_name == 'WrappedAPIView':
+                view_name = pattern.callback.__name__
+            values = dict(kwarg_values)
+            if view_name in pk_by_view:
+                values['pk'] = values['id'] = pk_by_view[view_name]
+            missing = [name for name in names if name not in values]
+            if missing:
+                yield URL_PREFIX + route, 'any', view_name, f"no value for {', '.join(missing)}"
+                continue
+
+            actions = getattr(pattern.callback, 'actions', None)
+            methods = list(actions) if actions else [m for m in view_class.http_method_names if m not in ('options', 'head', 'trace') and hasattr(view_class, m)]
+            if actions:
+                # Router write actions need payloads the audit does not have
+                methods = [m for m in methods if m == 'get']
+            for method in methods:
+                yield URL_PREFIX + build_path(route, values), method, view_name, None
+
+    def analyse(self, statements, n_plus_one_threshold):
+        findings = []
+        shapes = Counter(normalise(sql) for sql in statements if sql.lstrip().upper().startswith('SELECT'))
+        for shape, count in shapes.items():
+            if count >= n_plus_one_threshold:
+                findings.append({'kind': 'n_plus_one', 'count': count, 'sql': shape})
+
+        seen = set()
+        for sql in statements:
+            verb = sql.lstrip().split(' ', 1)[0].upper()
+            if verb not in ('SELECT', 'UPDATE', 'DELETE'):
+                continue
+            shape = normalise(sql)
+            if shape in seen:
+                continue
+            seen.add(shape)
+
+            if verb == 'SELECT' and is_unbounded(sql):
+                findings.append({'kind': 'unbounded', 'sql': sql})
+            for kind, detail in explain(sql):
+                findings.append({'kind': kind, 'detail': detail, 'sql': sql})
+        return findings
+
+
+def walk_patterns(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from walk_patterns(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            yield prefix + str(pattern.pattern), pattern
+
+
+def build_path(route, values):
+    path = re.sub(r'\(\?P<(\w+)>[^)]*\)', lambda m: str(values[m.group(1)]), route)
+    path = re.sub(r'<(?:\w+:)?(\w+)>', lambda m: str(values[m.group(1)]), path)
+    return path.replace('^', '').replace('$', '').replace('\\', '')
+
+
+def normalise(sql):
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    return re.sub(r'IN \([?, ]+\)', 'IN (...)', sql)
+
+
+def is_unbounded(sql):
+    upper = sql.upper()
+    if ' LIMIT ' in upper:
+        return False
+    if (AGGREGATE.match(upper) and ' GROUP BY ' not in upper) or re.match(r'SELECT\s+\(?1\)? AS', upper):
+        return False
+    # Primary key lookups return at most a handful of rows
+    return not re.search(r'\."ID" (= \d|IN \()', upper)
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return sqlite_findings([row[3] for row in cursor.fetchall()], sql)
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            return postgres_findings(cursor.fetchone()[0][0]['Plan'])
+    return []
+
+
+def sqlite_findings(plan, sql):
+    findings = []
+    filtered = ' WHERE ' in sql.upper()
+    for detail in plan:
+        # SCAN (subquery-N) reads a subquery's own result, which is not a table that could be indexed
+        if re.match(r'SCAN [^(\s]\S*$', detail):
+            findings.append(('missing_index' if filtered else 'full_scan', detail))
+        elif 'USE TEMP B-TREE' in detail:
+            findings.append(('missing_index', detail))
+    return findings
+
+
+def postgres_findings(node):
+    findings = []
+    if node['Node Type'] == 'Seq Scan':
+        kind = 'missing_index' if 'Filter' in node else 'full_scan'
+        findings.append((kind, f"Seq Scan on {node['Relation Name']}"))
+    elif node['Node Type'] == 'Sort':
+        findings.append(('missing_index', f"Sort on {', '.join(node.get('Sort Key', []))}"))
+    for child in node.get('Plans', []):
+        findings.extend(postgres_findings(child))
+    return findings
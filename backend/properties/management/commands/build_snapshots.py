@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from properties.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Renders the public property listing snapshots now instead of waiting for the next property change."
+
+    def handle(self, *args, **options):
+        version = build_snapshots()
+        self.stdout.write(f"Published listing snapshot {version}.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from properties.deletion import process_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Runs pending background deletion jobs, including ones abandoned by a dead worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help="Also rerun jobs that failed.")
+
+    def handle(self, *args, **options):
+        count = process_pending_jobs(retry_failed=options['retry_failed'])
+        self.stdout.write(f"Processed {count} deletion job(s).")
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from properties.events import hub
+from properties.sse import stream_events
+
+
+class Command(BaseCommand):
+    help = "Holds many idle server-sent event subscribers on one event loop and times a broadcast to all of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options['subscribers']))
+
+    async def run(self, count):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        received = asyncio.Event()
+        remaining = [count]
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if b'event: loadtest' in message.get('body', b''):
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    received.set()
+
+        async def client():
+            subscription = hub.subscribe()
+            try:
+                await stream_events(subscription, receive, send)
+            finally:
+                hub.unsubscribe(subscription)
+
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(client()) for _ in range(count)]
+        while hub.subscriber_count() < count:
+            await asyncio.sleep(0.01)
+        connect_time = time.perf_counter() - started
+        held = tracemalloc.get_traced_memory()[0] - baseline
+
+        # Publish from another thread, as a sync view or signal handler would
+        started = time.perf_counter()
+        threading.Thread(target=hub.publish, args=('loadtest', {'ping': True})).start()
+        await asyncio.wait_for(received.wait(), timeout=60)
+        broadcast_time = time.perf_counter() - started
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        tracemalloc.stop()
+
+        self.stdout.write(f"subscribers held:      {count}")
+        self.stdout.write(f"connect time:          {connect_time * 1000:.0f} ms")
+        self.stdout.write(f"memory held:           {held / 1024 / 1024:.1f} MiB ({held / count / 1024:.1f} KiB per subscriber)")
+        self.stdout.write(f"broadcast to all:      {broadcast_time * 1000:.0f} ms")
+        self.stdout.write(f"left subscribed:       {hub.subscriber_count()}")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_background_deletion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_plan', 'payment_date', 'id'], name='payment_plan_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 19:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentplan',
+            name='archived_paid',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Successful payments moved to the archive', max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payment_date', models.DateTimeField(db_index=True)),
+                ('method', models.CharField(choices=[('bank_transfer', 'Bank Transfer'), ('card', 'Card'), ('cash', 'Cash'), ('ussd', 'USSD')], max_length=50)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('successful', 'Successful'), ('failed', 'Failed')], max_length=50)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payment_plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_payments', to='properties.paymentplan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['payment_plan', 'payment_date', 'id'], name='archived_plan_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_payment_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='property',
+            name='title',
+            field=models.CharField(db_index=True, max_length=250),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-19 19:53
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_archived_payments(apps, schema_editor):
+    PaymentPlan = apps.get_model('properties', 'PaymentPlan')
+    ArchivedPayment = apps.get_model('properties', 'ArchivedPayment')
+    counts = ArchivedPayment.objects.values('payment_plan_id').annotate(
+        successful=Count('id', filter=Q(status='successful')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    for plan in counts:
+        PaymentPlan.objects.filter(pk=plan['payment_plan_id']).update(
+            archived_successful_count=plan['successful'],
+            archived_failed_count=plan['failed'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0011_property_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentplan',
+            name='archived_failed_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of failed payments moved to the archive'),
+        ),
+        migrations.AddField(
+            model_name='paymentplan',
+            name='archived_successful_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of successful payments moved to the archive'),
+        ),
+        migrations.RunPython(count_archived_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_archived_payment_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_fingerprint',
+            field=models.CharField(blank=True, default='', help_text='Hash of the amount, method and reference the key was first used with', max_length=64),
+        ),
+    ]
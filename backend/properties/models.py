@@ -1,8 +1,15 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 
+class ActiveManager(models.Manager):
+    # Hides rows marked deleted that are waiting to be removed in the background
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
@@ -12,7 +19,7 @@ class User(AbstractUser):
 
 
 class Property(models.Model):
-    title = models.CharField(max_length=250)
+    title = models.CharField(max_length=250, db_index=True)
     description = models.TextField(null=True, blank=True)
     location = models.CharField(max_length=250, blank=True, null=True)
     choices_listing_type = (
@@ -45,13 +52,17 @@ class Property(models.Model):
     elevator = models.BooleanField(default=False)
     cctv = models.BooleanField(default=False)
     parking = models.BooleanField(default=False)
-    date_posted = models.DateTimeField(default=timezone.now)
+    date_posted = models.DateTimeField(default=timezone.now, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
     picture1 = models.ImageField(null=True, blank=True, upload_to="pictures/%Y/%m/%d/")
     picture2 = models.ImageField(null=True, blank=True, upload_to="pictures/%Y/%m/%d/")
     picture3 = models.ImageField(null=True, blank=True, upload_to="pictures/%Y/%m/%d/")
     picture4 = models.ImageField(null=True, blank=True, upload_to="pictures/%Y/%m/%d/")
     picture5 = models.ImageField(null=True, blank=True, upload_to="pictures/%Y/%m/%d/")
 
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.title
@@ -69,9 +80,17 @@ class PaymentPlan(models.Model):
     plan_type = models.CharField(max_length=50, choices=PLAN_CHOICES)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    archived_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Successful payments moved to the archive")
+    archived_successful_count = models.PositiveIntegerField(default=0, help_text="Number of successful payments moved to the archive")
+    archived_failed_count = models.PositiveIntegerField(default=0, help_text="Number of failed payments moved to the archive")
     installments = models.PositiveIntegerField(help_text="Number of installments")
     next_due_date = models.DateField(null=True, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     def balance(self):
       return self.total_amount - self.amount_paid
@@ -83,26 +102,116 @@ class PaymentPlan(models.Model):
 class Payment(models.Model):
     payment_plan = models.ForeignKey('PaymentPlan', on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
-    payment_date = models.DateTimeField(default=timezone.now)
+    payment_date = models.DateTimeField(default=timezone.now, db_index=True)
     method = models.CharField(max_length=50, choices=[
       ('bank_transfer', 'Bank Transfer'),
       ('card', 'Card'),
       ('cash', 'Cash'),
       ('ussd', 'USSD'),
     ])
-    reference = models.CharField(max_length=100, blank=True, null=True)  # Transaction ID etc
+    reference = models.CharField(max_length=100, blank=True, null=True, db_index=True)  # Transaction ID etc
     status = models.CharField(max_length=50, choices=[
       ('pending', 'Pending'),
       ('successful', 'Successful'),
       ('failed', 'Failed'),
     ], default='successfull')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_plan', 'reference'], name='payment_plan_reference_idx'),
+            models.Index(fields=['payment_plan', 'payment_date', 'id'], name='payment_plan_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.payment_plan.user.username} - {self.amount} on {self.payment_date.strftime('%Y-%m%d')}"
    
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        successful_payments = self.payment_plan.payments.filter(status='successful')
-        total_paid = sum(p.amount for p in successful_payments)
-        self.payment_plan.amount_paid = total_paid
-        self.payment_plan.save()
\ No newline at end of file
+        # Archived payments are already totalled in archived_paid, so only the hot table is summed
+        total_paid = self.payment_plan.payments.filter(status='successful').aggregate(total=models.Sum('amount'))['total'] or 0
+        self.payment_plan.amount_paid = self.payment_plan.archived_paid + total_paid
+        self.payment_plan.save()
+
+
+class ArchivedPayment(models.Model):
+    # Settled payments moved out of Payment by properties.archive; ids are kept from the original rows
+    id = models.BigIntegerField(primary_key=True)
+    payment_plan = models.ForeignKey('PaymentPlan', on_delete=models.CASCADE, related_name='archived_payments')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payment_date = models.DateTimeField(db_index=True)
+    method = models.CharField(max_length=50, choices=Payment._meta.get_field('method').choices)
+    reference = models.CharField(max_length=100, blank=True, null=True)
+    status = models.CharField(max_length=50, choices=Payment._meta.get_field('status').choices)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_plan', 'payment_date', 'id'], name='archived_plan_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.payment_plan_id} - {self.amount} on {self.payment_date.strftime('%Y-%m-%d')} (archived)"
+
+
+class Tombstone(models.Model):
+    # Left behind when a synced record is deleted so clients can drop it on their next sync
+    model_name = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    user_id = models.BigIntegerField(null=True, blank=True)  # Owner, for records only their owner may sync
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model_name', 'deleted_at'], name='tombstone_model_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_name} {self.object_id} deleted {self.deleted_at}"
+
+
+class DeletionJob(models.Model):
+    # Progress of a background, chunked deletion of a property, payment plan or user
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    model_name = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def progress(self):
+        if self.status == 'done':
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.deleted * 100 / self.total))
+
+    def __str__(self):
+        return f"Delete {self.model_name} {self.object_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    # Stored response for a client supplied Idempotency-Key, replayed on retries
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    payment_plan = models.ForeignKey(PaymentPlan, on_delete=models.CASCADE, related_name='idempotency_keys')
+    request_fingerprint = models.CharField(max_length=64, blank=True, default='', help_text="Hash of the amount, method and reference the key was first used with")
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
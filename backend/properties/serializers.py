@@ -1,10 +1,12 @@
 from rest_framework import serializers
-from .models import Property, User, PaymentPlan, Payment
+from .models import Property, User, PaymentPlan, Payment, ArchivedPayment, DeletionJob
 
 class PropertySerializer(serializers.ModelSerializer):
     class Meta:
         model = Property
         fields = '__all__'
+        # Deletion goes through delete_property so the tombstone and the background job are not skipped
+        read_only_fields = ['updated_at', 'deleted_at']
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -27,6 +29,7 @@ class PaymentPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = PaymentPlan
         fields = '__all__'
+        read_only_fields = ['updated_at', 'deleted_at', 'archived_paid', 'archived_successful_count', 'archived_failed_count']
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -35,6 +38,20 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ArchivedPaymentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedPayment
+        fields = '__all__'
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = DeletionJob
+        fields = ['id', 'model_name', 'object_id', 'status', 'total', 'deleted', 'progress', 'error', 'created_at', 'updated_at']
+
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
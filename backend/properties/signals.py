@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .events import hub
+from .ledger import invalidate_statement
+from .snapshots import schedule_rebuild
+from .models import Property, PaymentPlan, Payment, Tombstone
+
+
+# Rows scheduled for background deletion were tombstoned when they were marked
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, **kwargs):
+    if instance.deleted_at:
+        return
+    Tombstone.objects.create(model_name='property', object_id=instance.pk)
+
+
+# Also fires for plans removed by a property or user cascade
+@receiver(post_delete, sender=PaymentPlan)
+def payment_plan_deleted(sender, instance, **kwargs):
+    if instance.deleted_at:
+        return
+    Tombstone.objects.create(model_name='paymentplan', object_id=instance.pk, user_id=instance.user_id)
+
+
+# Push events are only sent once the write has committed
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created, **kwargs):
+    data = {
+        'id': instance.pk,
+        'title': instance.title,
+        'listing_type': instance.listing_type,
+        'property_status': instance.property_status,
+        'price': instance.price,
+    }
+    event_type = 'property.created' if created else 'property.updated'
+    transaction.on_commit(lambda: hub.publish(event_type, data))
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, **kwargs):
+    data = {
+        'id': instance.pk,
+        'payment_plan': instance.payment_plan_id,
+        'amount': instance.amount,
+        'method': instance.method,
+        'status': instance.status,
+        'payment_date': instance.payment_date,
+    }
+    event_type = 'payment.created' if created else 'payment.updated'
+    transaction.on_commit(lambda: hub.publish(event_type, data))
+
+
+# Payment.save() saves the plan, which already moves the statement on to a new cache key
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    invalidate_statement(instance.payment_plan_id)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def property_changed(sender, instance, **kwargs):
+    transaction.on_commit(schedule_rebuild)
@@ -0,0 +1,146 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Property, Tombstone
+
+
+AMENITIES = ('furnished', 'pool', 'elevator', 'cctv', 'parking')
+LISTING_TYPES = [choice for choice, _ in Property.choices_listing_type]
+PROPERTY_STATUSES = [choice for choice, _ in Property.choices_property_status]
+
+# Numeric columns: log price, rooms, then one per amenity
+NUMERIC_WEIGHTS = np.array([4.0, 0.5] + [0.25] * len(AMENITIES), dtype=np.float32)
+# Penalty when a categorical column differs from the viewed property
+LISTING_TYPE_WEIGHT = 3.0
+STATUS_WEIGHT = 2.0
+LOCATION_WEIGHT = 2.0
+# Distance contributed by a numeric column that is missing on either side
+MISSING_PENALTY = 1.0
+
+FIELDS = ('id', 'price', 'rooms', 'listing_type', 'property_status', 'location') + AMENITIES
+
+
+class FeatureIndex:
+    """Array-backed feature matrix over every listed property.
+
+    Rows are kept in preallocated NumPy arrays that grow by doubling; a
+    removed row is filled by moving the last row into its slot. Before each
+    lookup the index pulls in only the properties updated, and the
+    tombstones written, since it last synced, so it stays current across
+    processes without a full rebuild.
+    """
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._numeric = np.zeros((capacity, len(NUMERIC_WEIGHTS)), dtype=np.float32)
+        self._codes = np.zeros((capacity, 3), dtype=np.int32)  # listing type, status, location
+        self._rows = {}
+        self._locations = {}
+        self._size = 0
+        self._synced_at = None
+
+    def __len__(self):
+        return self._size
+
+    def similar(self, property_id, limit=10):
+        # Returns [(property_id, distance)] nearest first, or None if property_id is not indexed
+        with self._lock:
+            self._sync()
+            row = self._rows.get(property_id)
+            if row is None:
+                return None
+
+            size = self._size
+            numeric = self._numeric[:size]
+            diff = numeric - numeric[row]
+            squared = np.where(np.isnan(diff), MISSING_PENALTY, diff * diff)
+            distance = squared @ NUMERIC_WEIGHTS
+
+            codes = self._codes[:size]
+            mismatch = codes != codes[row]
+            # Unknown location (-1) never counts as a match
+            mismatch[:, 2] |= codes[:, 2] == -1
+            distance += mismatch @ np.array([LISTING_TYPE_WEIGHT, STATUS_WEIGHT, LOCATION_WEIGHT], dtype=np.float32)
+            distance[row] = np.inf
+
+            limit = min(limit, size - 1)
+            if limit <= 0:
+                return []
+            nearest = np.argpartition(distance, limit - 1)[:limit]
+            nearest = nearest[np.argsort(distance[nearest], kind='stable')]
+            return [(int(self._ids[i]), float(distance[i])) for i in nearest]
+
+    def _sync(self):
+        now = timezone.now()
+        if self._synced_at is None:
+            changed = Property.objects.values_list(*FIELDS)
+            removed = []
+        else:
+            # updated_at is stamped before the write commits, so look back over a window; re-applying a row is harmless
+            since = self._synced_at - timedelta(seconds=getattr(settings, 'SYNC_CURSOR_LAG', 30))
+            changed = Property.all_objects.filter(updated_at__gte=since).values_list(*FIELDS + ('deleted_at',))
+            removed = Tombstone.objects.filter(model_name='property', deleted_at__gte=since).values_list('object_id', flat=True)
+
+        for values in changed:
+            if len(values) > len(FIELDS) and values[-1] is not None:
+                self._remove(values[0])
+            else:
+                self._upsert(values[:len(FIELDS)])
+        for property_id in removed:
+            self._remove(property_id)
+        self._synced_at = now
+
+    def _upsert(self, values):
+        property_id, price, rooms, listing_type, property_status, location = values[:6]
+        amenities = values[6:]
+
+        row = self._rows.get(property_id)
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[property_id] = row
+
+        self._ids[row] = property_id
+        self._numeric[row, 0] = np.log1p(float(price)) if price is not None else np.nan
+        self._numeric[row, 1] = rooms if rooms is not None else np.nan
+        self._numeric[row, 2:] = amenities
+        self._codes[row] = (
+            LISTING_TYPES.index(listing_type) if listing_type in LISTING_TYPES else -1,
+            PROPERTY_STATUSES.index(property_status) if property_status in PROPERTY_STATUSES else -1,
+            self._location_code(location),
+        )
+
+    def _remove(self, property_id):
+        row = self._rows.pop(property_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._ids[row] = self._ids[last]
+            self._numeric[row] = self._numeric[last]
+            self._codes[row] = self._codes[last]
+            self._rows[moved_id] = row
+        self._size = last
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        self._numeric = np.resize(self._numeric, (capacity, self._numeric.shape[1]))
+        self._codes = np.resize(self._codes, (capacity, self._codes.shape[1]))
+
+    def _location_code(self, location):
+        location = (location or '').strip().lower()
+        if not location:
+            return -1
+        return self._locations.setdefault(location, len(self._locations))
+
+
+index = FeatureIndex()
@@ -0,0 +1,132 @@
+import gzip
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Property
+from .serializers import PropertySerializer
+
+
+CURRENT = 'current'
+MANIFEST = 'manifest.json'
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def snapshot_root():
+    return Path(getattr(settings, 'SNAPSHOT_ROOT', Path(settings.BASE_DIR) / 'snapshots'))
+
+
+def filter_sets():
+    # (name, field, value) for every pre-rendered filter; name is used as the directory
+    yield 'all', None, None
+    for value, _ in Property.choices_listing_type:
+        yield f'listing_type-{value}', 'listing_type', value
+    for value, _ in Property.choices_property_status:
+        yield f'property_status-{value}', 'property_status', value
+
+
+def listing_queryset():
+    return Property.objects.all().order_by('-date_posted', '-id')
+
+
+def page_payload(version, results, page, page_size, count):
+    return {
+        'version': version,
+        'count': count,
+        'page': page,
+        'num_pages': max(1, -(-count // page_size)),
+        'results': results,
+    }
+
+
+def build_snapshots():
+    """Render every filter set and page to JSON and gzip files, then publish them.
+
+    Files are written into a fresh version directory which is switched in by
+    atomically replacing the `current` symlink, so readers never see a
+    partly written snapshot. Returns the new version.
+    """
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+    page_size = getattr(settings, 'SNAPSHOT_PAGE_SIZE', 50)
+    version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    staging = root / f'.v{version}'
+
+    try:
+        # Serialize each property once and bucket it into every filter set it belongs to
+        rows = PropertySerializer(listing_queryset(), many=True).data
+        manifest = {'version': version, 'page_size': page_size, 'filter_sets': {}}
+        for name, field, value in filter_sets():
+            matching = [row for row in rows if field is None or row[field] == value]
+            directory = staging / name
+            directory.mkdir(parents=True)
+            pages = [matching[i:i + page_size] for i in range(0, len(matching), page_size)] or [[]]
+            for number, results in enumerate(pages, start=1):
+                write_file(directory / f'page-{number}.json', page_payload(version, results, number, page_size, len(matching)))
+            manifest['filter_sets'][name] = {'count': len(matching), 'num_pages': len(pages)}
+        # The unpaginated list returned by property_list
+        write_file(staging / 'all' / 'full.json', rows)
+        write_file(staging / MANIFEST, manifest)
+
+        staging.rename(root / f'v{version}')
+    finally:
+        # Only left behind when the build failed part way through
+        shutil.rmtree(staging, ignore_errors=True)
+    link = root / f'.{CURRENT}-{version}'
+    link.symlink_to(f'v{version}')
+    os.replace(link, root / CURRENT)
+    prune_versions(root)
+    return version
+
+
+def write_file(path, data):
+    body = JSONRenderer().render(data)
+    path.write_bytes(body)
+    path.with_name(path.name + '.gz').write_bytes(gzip.compress(body))
+
+
+def prune_versions(root):
+    # Keep a few old versions so responses already streaming from them can finish
+    keep = getattr(settings, 'SNAPSHOT_KEEP_VERSIONS', 3)
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.is_symlink() and p.name.startswith('v'))
+    for old in versions[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def snapshot_file(name, gzipped=False):
+    # (path, version) of a published snapshot file, or None when it has not been built
+    directory = (snapshot_root() / CURRENT).resolve()
+    path = directory / (name + '.gz' if gzipped else name)
+    return (path, directory.name) if path.is_file() else None
+
+
+def schedule_rebuild():
+    """Rebuild SNAPSHOT_DEBOUNCE seconds after the first of a burst of writes.
+
+    Later writes in the same window are covered by the pending rebuild.
+    """
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            return
+        _timer = threading.Timer(getattr(settings, 'SNAPSHOT_DEBOUNCE', 5), _rebuild)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _rebuild():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    try:
+        build_snapshots()
+    finally:
+        connection.close()
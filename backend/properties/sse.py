@@ -0,0 +1,95 @@
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.authtoken.models import Token
+
+from .events import hub, format_event
+
+
+SSE_PATH = '/api/properties/events/'
+
+
+@sync_to_async
+def authenticate_token(key):
+    try:
+        return Token.objects.select_related('user').get(key=key).user
+    except Token.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+
+
+def token_from_scope(scope):
+    # EventSource cannot set headers, so ?token= is accepted as well as the Authorization header
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword.lower() == 'token' and key:
+                return key.strip()
+    token = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token')
+    return token[0] if token else None
+
+
+def response_headers(content_type):
+    headers = [(b'content-type', content_type)]
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        headers.append((b'access-control-allow-origin', b'*'))
+    return headers
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app streaming property and payment events to staff as server-sent events.
+
+    Held connections cost a queue and a couple of idle tasks, not a thread,
+    so a single worker can keep thousands of dashboards subscribed.
+    """
+    key = token_from_scope(scope)
+    user = await authenticate_token(key) if key else None
+    if user is None or not user.is_active:
+        await send({'type': 'http.response.start', 'status': 401, 'headers': response_headers(b'application/json')})
+        detail = b'{"detail": "Invalid token."}' if key else b'{"detail": "Authentication credentials were not provided."}'
+        await send({'type': 'http.response.body', 'body': detail})
+        return
+    # Payment events carry every user's amounts and plans, so the stream is for staff dashboards only
+    if not user.is_staff:
+        await send({'type': 'http.response.start', 'status': 403, 'headers': response_headers(b'application/json')})
+        await send({'type': 'http.response.body', 'body': b'{"detail": "You do not have permission to perform this action."}'})
+        return
+
+    subscription = hub.subscribe()
+    try:
+        await stream_events(subscription, receive, send)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def stream_events(subscription, receive, send):
+    keepalive = getattr(settings, 'EVENTS_KEEPALIVE', 15)
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    headers = response_headers(b'text/event-stream') + [(b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({next_event, disconnected}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                next_event.cancel()
+                return
+            if next_event in done:
+                body = format_event(next_event.result())
+            else:
+                next_event.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnected.cancel()
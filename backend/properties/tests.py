@@ -1,3 +1,578 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site as admin_site
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import idempotency, snapshots
+from .admin import PaymentAdmin
+from .management.commands import audit_queries
+from .archive import archive_payments, payments_in_range
+from .deletion import schedule_deletion, run_job
+from .ledger import statement_cache_key
+from .events import hub
+from .similarity import FeatureIndex
+from .sse import SSE_PATH, sse_application
+from .models import Property, User, PaymentPlan, Payment, ArchivedPayment, IdempotencyKey, Tombstone, DeletionJob
+
+
+def make_user(username='buyer', **extra):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='secret', **extra)
+
+
+def make_plan(user, total_amount=1000, **extra):
+    property_obj = Property.objects.create(title=extra.pop('title', 'Flat'), price=100000)
+    return PaymentPlan.objects.create(user=user, property=property_obj, plan_type='Instalment', total_amount=total_amount, installments=10, **extra)
+
+
+class MakePaymentIdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.plan = make_plan(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/properties/payment-plans/{self.plan.pk}/make-payment/'
+
+    def pay(self, amount='10', key=None, **data):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post(self.url, {'amount': amount, **data}, format='json', **headers)
+
+    def test_retry_replays_the_original_response(self):
+        first = self.pay(key='abc')
+        retry = self.pay(key='abc')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.amount_paid, Decimal('10'))
+
+    def test_key_used_on_another_plan_is_rejected(self):
+        other = make_plan(self.user, title='House')
+        self.pay(key='abc')
+        response = self.client.post(f'/api/properties/payment-plans/{other.pk}/make-payment/', {'amount': '10'}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Payment.objects.filter(payment_plan=other).exists())
+
+    def test_concurrent_retry_that_missed_the_lookup_does_not_pay_twice(self):
+        self.pay(key='abc')
+        real_lookup = idempotency.get_stored_response
+        calls = []
+
+        # The first lookup runs before the other request committed and sees nothing
+        def lookup(user, key):
+            calls.append(key)
+            return None if len(calls) == 1 else real_lookup(user, key)
+
+        with mock.patch('properties.views.get_stored_response', side_effect=lookup):
+            response = self.pay(key='abc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['new_balance'], 990.0)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_failed_payment_does_not_claim_the_key(self):
+        self.assertEqual(self.pay(amount='5000', key='abc').status_code, 400)
+        self.assertEqual(self.pay(amount='10', key='abc').status_code, 200)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_resent_reference_is_not_recorded_twice(self):
+        self.pay(reference='TX-1')
+        response = self.pay(reference='TX-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Payment.objects.filter(reference='TX-1').count(), 1)
+
+    def test_key_reused_for_a_different_payment_is_rejected(self):
+        self.pay(amount='20', key='abc')
+        response = self.pay(amount='300', key='abc')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Payment.objects.count(), 1)
+        # The same payment written differently is still a retry
+        self.assertEqual(self.pay(amount='20.00', key='abc').status_code, 200)
+
+    def test_reference_reused_for_a_different_amount_is_rejected(self):
+        self.pay(amount='10', reference='R1')
+        response = self.pay(amount='500', reference='R1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(list(Payment.objects.values_list('amount', flat=True)), [Decimal('10')])
+
+    def test_resend_does_not_lock_the_plan(self):
+        self.pay(reference='R1')
+        with mock.patch.object(PaymentPlan.objects, 'select_for_update', side_effect=AssertionError('plan locked')):
+            self.assertEqual(self.pay(reference='R1').status_code, 200)
+
+    def test_non_numeric_and_non_finite_amounts_are_rejected(self):
+        for amount in ('abc', 'NaN', 'Infinity', '-Infinity', None):
+            with self.subTest(amount=amount):
+                self.assertEqual(self.pay(amount=amount).status_code, 400)
+        self.assertFalse(Payment.objects.exists())
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def sync(self, since=None):
+        return self.client.get('/api/properties/sync/', {'since': since} if since else {})
+
+    def test_full_sync_then_delta(self):
+        old = Property.objects.create(title='Old')
+        cursor = self.sync().json()['cursor']
+        self.assertIsNotNone(parse_datetime(cursor).tzinfo)
+
+        Property.objects.filter(pk=old.pk).update(updated_at=parse_datetime(cursor) - timedelta(minutes=5))
+        new = Property.objects.create(title='New')
+        Tombstone.objects.create(model_name='property', object_id=99)
+        data = self.sync(cursor).json()
+
+        self.assertEqual([row['id'] for row in data['properties']['updated']], [new.pk])
+        self.assertEqual(data['properties']['deleted'], [99])
+
+    def test_cursor_trails_the_clock_so_late_commits_are_delivered(self):
+        cursor = self.sync().json()['cursor']
+        # Stamped by auto_now before the read above, committed after it
+        late = Property.objects.create(title='Late')
+        Property.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=1))
+
+        data = self.sync(cursor).json()
+        self.assertIn(late.pk, [row['id'] for row in data['properties']['updated']])
+
+    def test_invalid_cursors_are_rejected(self):
+        for since in ('yesterday', '2026-13-45T00:00:00Z', '2026-01-01T00:00:00'):
+            with self.subTest(since=since):
+                self.assertEqual(self.sync(since).status_code, 400)
+
+    def test_payment_plans_only_for_their_owner(self):
+        owner, other = make_user('owner'), make_user('other')
+        plan = make_plan(owner)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.sync().json()['payment_plans']['updated'], [])
+        self.client.force_authenticate(owner)
+        self.assertEqual([row['id'] for row in self.sync().json()['payment_plans']['updated']], [plan.pk])
+
+
+class EventStreamTests(TransactionTestCase):
+    # The token is looked up on another thread, so the data has to be committed
+
+    def stream(self, user, publish=None):
+        token = Token.objects.create(user=user)
+        scope = {'type': 'http', 'path': SSE_PATH, 'headers': [(b'authorization', f'Token {token.key}'.encode())], 'query_string': b''}
+        sent = []
+
+        async def run():
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if message.get('more_body') and publish:
+                    if len(sent) == 2:
+                        hub.publish(*publish)
+                    else:
+                        disconnect.set()
+
+            await asyncio.wait_for(sse_application(scope, receive, send), timeout=5)
+
+        asyncio.run(run())
+        return sent
+
+    def test_staff_receive_payment_events(self):
+        sent = self.stream(make_user('admin', is_staff=True), publish=('payment.created', {'id': 1, 'amount': 10}))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'event: payment.created', sent[2]['body'])
+
+    def test_non_staff_are_refused(self):
+        sent = self.stream(make_user())
+        self.assertEqual(sent[0]['status'], 403)
+        self.assertEqual(hub.subscriber_count(), 0)
+
+
+@override_settings(DELETION_RUN_IN_THREAD=False, DELETION_CHUNK_SIZE=2)
+class BackgroundDeletionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.plan = make_plan(self.user)
+        self.property = self.plan.property
+        for i in range(5):
+            Payment.objects.create(payment_plan=self.plan, amount=10, method='cash', status='successful')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_property_is_hidden_at_once_and_removed_in_chunks(self):
+        response = self.client.delete(f'/api/properties/{self.property.pk}/delete/')
+        self.assertEqual(response.status_code, 202)
+        job = DeletionJob.objects.get(pk=response.json()['job'])
+
+        self.assertFalse(Property.objects.filter(pk=self.property.pk).exists())
+        self.assertFalse(PaymentPlan.objects.filter(pk=self.plan.pk).exists())
+        self.assertEqual(self.client.get('/api/properties/payments-list/').json(), [])
+        self.assertEqual(self.client.get('/api/properties/report-summary/').json()['total_amount_paid'], 0)
+        self.assertTrue(Tombstone.objects.filter(model_name='paymentplan', object_id=self.plan.pk).exists())
+
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total, job.deleted, job.progress()), ('done', 7, 7, 100))
+        self.assertFalse(Property.all_objects.filter(pk=self.property.pk).exists())
+        self.assertFalse(Payment.objects.exists())
+        # Marked rows were tombstoned when scheduled, not again when removed
+        self.assertEqual(Tombstone.objects.filter(model_name='paymentplan').count(), 1)
+
+    def test_payments_are_deleted_without_a_plan_update_per_row(self):
+        job = schedule_deletion(self.plan)
+        with CaptureQueriesContext(connection) as captured:
+            run_job(job.pk)
+        plan_updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "properties_paymentplan"')]
+        # One per chunk of DELETION_CHUNK_SIZE=2 payments
+        self.assertEqual(len(plan_updates), 3)
+
+    def test_job_is_only_run_once(self):
+        job = schedule_deletion(self.plan)
+        run_job(job.pk)
+        DeletionJob.objects.filter(pk=job.pk).update(status='running')
+        run_job(job.pk)
+        self.assertEqual(DeletionJob.objects.get(pk=job.pk).deleted, 6)
+
+    def test_user_is_hidden_from_listings_until_removed(self):
+        staff = make_user('admin', is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.delete(f'/api/properties/user-list/{self.user.pk}/')
+        self.assertEqual(response.status_code, 202)
+
+        self.assertNotIn(self.user.pk, [row['id'] for row in self.client.get('/api/properties/user-list/').json()])
+        self.assertNotIn(self.user.pk, [row['id'] for row in self.client.get('/api/properties/api/users/').json()])
+        self.assertEqual(self.client.get(f'/api/properties/api/users/{self.user.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f"/api/properties/deletion-jobs/{response.json()['job']}/").status_code, 200)
+
+    def test_deletion_jobs_are_only_shown_to_staff(self):
+        job = schedule_deletion(self.plan)
+        self.assertEqual(self.client.get(f'/api/properties/deletion-jobs/{job.pk}/').status_code, 403)
+
+    def test_deletion_fields_cannot_be_written_through_the_api(self):
+        response = self.client.put(f'/api/properties/edit-property/{self.property.pk}/', {'title': 'Renamed', 'deleted_at': '2026-01-01T00:00:00Z'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.title, 'Renamed')
+        self.assertIsNone(self.property.deleted_at)
+
+
+class AuditQueriesTests(TestCase):
+    def test_single_row_aggregates_are_not_unbounded(self):
+        self.assertFalse(audit_queries.is_unbounded('SELECT COUNT(*) AS "__count" FROM "properties_payment"'))
+        self.assertFalse(audit_queries.is_unbounded('SELECT (CAST(SUM("properties_payment"."amount") AS NUMERIC)) AS "total" FROM "properties_payment"'))
+        self.assertTrue(audit_queries.is_unbounded('SELECT "properties_payment"."payment_plan_id", COUNT(*) FROM "properties_payment" GROUP BY 1'))
+        self.assertTrue(audit_queries.is_unbounded('SELECT "properties_property"."id" FROM "properties_property"'))
+
+    def test_scanning_a_subquery_is_not_a_missing_index(self):
+        sql = 'SELECT * FROM (SELECT 1) "subquery" WHERE 1'
+        self.assertEqual(audit_queries.sqlite_findings(['SCAN (subquery-2)'], sql), [])
+        self.assertEqual(audit_queries.sqlite_findings(['SCAN properties_payment'], sql), [('missing_index', 'SCAN properties_payment')])
+
+    @override_settings(DELETION_RUN_IN_THREAD=False)
+    def test_streamed_bodies_are_read_inside_the_capture(self):
+        report = audit_queries.Command().audit({'properties': 3, 'n_plus_one_threshold': 3})
+        statement = next(route for route in report['routes'] if route['view'] == 'payment_plan_statement')
+
+        self.assertEqual(statement['status'], 200)
+        self.assertTrue(any('"properties_archivedpayment"' in sql for sql in statement['queries']))
+        self.assertEqual(statement['findings'], [])
+
+    def test_routes_without_kwarg_values_are_reported_as_skipped(self):
+        ids = {'user': 1, 'property': 2, 'plan': 3, 'payment': 4, 'job': 5}
+        with mock.patch.object(audit_queries, 'walk_patterns', return_value=[('thing/<slug:unknown>/', mock.Mock(callback=audit_queries.properties_urls.views.property_list))]):
+            requests = list(audit_queries.Command().requests(ids))
+
+        self.assertEqual(requests, [('/api/properties/thing/<slug:unknown>/', 'any', 'property_list', 'no value for unknown')])
+
+
+class SimilarityIndexTests(TestCase):
+    def test_nearest_first_and_kept_in_sync(self):
+        base = Property.objects.create(title='Base', price=100000, rooms=3, listing_type='House', property_status='Sale')
+        close = Property.objects.create(title='Close', price=110000, rooms=3, listing_type='House', property_status='Sale')
+        far = Property.objects.create(title='Far', price=5000000, rooms=8, listing_type='Office', property_status='Rent')
+        index = FeatureIndex(capacity=2)
+
+        self.assertEqual([pk for pk, _ in index.similar(base.pk)], [close.pk, far.pk])
+
+        Property.objects.filter(pk=close.pk).update(deleted_at=timezone.now(), updated_at=timezone.now())
+        self.assertEqual([pk for pk, _ in index.similar(base.pk)], [far.pk])
+
+    def test_write_committed_after_a_sync_is_picked_up(self):
+        base = Property.objects.create(title='Base', price=100000, rooms=3)
+        index = FeatureIndex()
+        index.similar(base.pk)
+
+        # Stamped by auto_now just before that sync, committed after it
+        late = Property.objects.create(title='Late', price=100000, rooms=3)
+        Property.objects.filter(pk=late.pk).update(updated_at=index._synced_at - timedelta(seconds=1))
+
+        self.assertEqual([pk for pk, _ in index.similar(base.pk)], [late.pk])
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.plan = make_plan(self.user)
+        start = timezone.now() - timedelta(days=10)
+        statuses = ['successful', 'failed', 'successful', 'pending', 'successful']
+        self.payments = [
+            Payment.objects.create(payment_plan=self.plan, amount=100, method='cash', status=status_, payment_date=start + timedelta(days=i))
+            for i, status_ in enumerate(statuses)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/properties/payment-plans/{self.plan.pk}/ledger/'
+
+    def test_running_totals_only_count_successful_payments(self):
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data['opening_balance'], 1000)
+        self.assertEqual([row['paid_to_date'] for row in data['entries']], [100, 100, 200, 200, 300])
+        self.assertEqual(data['entries'][-1]['balance'], 700)
+        self.assertIsNone(data['next'])
+
+    def test_pages_carry_the_total_forward(self):
+        first = self.client.get(self.url, {'page_size': 2}).json()
+        second = self.client.get(self.url, {'page_size': 2, 'after': first['next']}).json()
+
+        self.assertEqual(first['next'], self.payments[1].pk)
+        self.assertEqual(second['opening_balance'], 900)
+        self.assertEqual([row['id'] for row in second['entries']], [self.payments[2].pk, self.payments[3].pk])
+        self.assertEqual(second['entries'][0]['paid_to_date'], 200)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'after': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'after': 999999}).status_code, 400)
+
+    def test_statement_cache_moves_on_when_a_payment_changes(self):
+        url = f'/api/properties/payment-plans/{self.plan.pk}/statement/'
+        before = b''.join(self.client.get(url).streaming_content)
+        self.plan.refresh_from_db()
+        self.assertIsNotNone(cache.get(statement_cache_key(self.plan)))
+
+        Payment.objects.create(payment_plan=self.plan, amount=50, method='card', status='successful')
+        after = b''.join(self.client.get(url).streaming_content)
+        self.assertEqual(len(after.splitlines()), len(before.splitlines()) + 1)
+
+        self.payments[0].delete()
+        self.assertEqual(len(b''.join(self.client.get(url).streaming_content).splitlines()), len(before.splitlines()))
+
+
+class PaymentAdminTests(TestCase):
+    def setUp(self):
+        self.staff = make_user('admin', is_staff=True, is_superuser=True)
+        self.plan = make_plan(self.staff)
+        self.payments = [Payment.objects.create(payment_plan=self.plan, amount=100, method='cash', status='pending') for _ in range(3)]
+        self.request = RequestFactory().post('/admin/')
+        self.request.user = self.staff
+        self.admin = PaymentAdmin(Payment, admin_site)
+        self.admin.message_user = mock.Mock()
+
+    def test_bulk_status_change_updates_plans_and_publishes_events(self):
+        queryset = Payment.objects.filter(pk__in=[p.pk for p in self.payments[:2]])
+        with mock.patch('properties.admin.hub.publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            self.admin.mark_successful(self.request, queryset)
+
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.amount_paid, Decimal('200'))
+        self.assertEqual(sorted(call.args[1]['id'] for call in publish.call_args_list), [p.pk for p in self.payments[:2]])
+        self.assertEqual({(call.args[0], call.args[1]['status']) for call in publish.call_args_list}, {('payment.updated', 'successful')})
+
+    def test_title_search_is_an_exact_match(self):
+        Property.objects.create(title='Flat on the hill')
+        results, _ = admin_site._registry[Property].get_search_results(self.request, Property.objects.all(), 'Flat')
+        self.assertEqual([p.title for p in results], ['Flat'])
+
+
+class PaymentArchiveTests(TestCase):
+    def setUp(self):
+        self.user = make_user(is_staff=True)
+        self.plan = make_plan(self.user)
+        old = timezone.now() - timedelta(days=400)
+        for status_ in ('successful', 'successful', 'failed', 'pending'):
+            Payment.objects.create(payment_plan=self.plan, amount=100, method='cash', status=status_, payment_date=old)
+        self.recent = Payment.objects.create(payment_plan=self.plan, amount=50, method='cash', status='successful')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archiving_keeps_balances_and_report_unchanged(self):
+        self.plan.refresh_from_db()
+        balance = self.plan.balance()
+        report = self.client.get('/api/properties/report-summary/').json()
+
+        self.assertEqual(archive_payments(batch_size=2), 3)
+
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.balance(), balance)
+        self.assertEqual((self.plan.archived_paid, self.plan.archived_successful_count, self.plan.archived_failed_count), (Decimal('200'), 2, 1))
+        # Pending payments are never archived
+        self.assertEqual(list(Payment.objects.values_list('status', flat=True).order_by('status')), ['pending', 'successful'])
+        # Only recent_payments, which lists hot payments, may change
+        after = self.client.get('/api/properties/report-summary/').json()
+        del after['recent_payments'], report['recent_payments']
+        self.assertEqual(after, report)
+
+        # A later payment still recalculates amount_paid on top of the archived total
+        Payment.objects.create(payment_plan=self.plan, amount=25, method='cash', status='successful')
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.amount_paid, Decimal('275'))
+
+    def test_ledger_and_statement_merge_both_tables_by_date(self):
+        Payment.objects.all().delete()
+        old = timezone.now() - timedelta(days=400)
+        pending = Payment.objects.create(payment_plan=self.plan, amount=70, method='cash', status='pending', payment_date=old - timedelta(days=10))
+        paid = [Payment.objects.create(payment_plan=self.plan, amount=100, method='cash', status='successful', payment_date=old + timedelta(days=i)) for i in range(3)]
+        archive_payments(cutoff=old + timedelta(days=1, hours=1))
+        self.assertEqual(ArchivedPayment.objects.count(), 2)
+        # Recorded after the archive run, dated between two archived payments
+        backdated = Payment.objects.create(payment_plan=self.plan, amount=5, method='cash', status='successful', payment_date=old + timedelta(hours=12))
+
+        url = f'/api/properties/payment-plans/{self.plan.pk}/ledger/'
+        entries = self.client.get(url).json()['entries']
+        self.assertEqual([row['id'] for row in entries], [pending.pk, paid[0].pk, backdated.pk, paid[1].pk, paid[2].pk])
+        self.assertEqual([row['paid_to_date'] for row in entries], [0, 100, 105, 205, 305])
+        self.assertEqual([row['archived'] for row in entries], [False, True, False, True, False])
+
+        second = self.client.get(url, {'page_size': 2, 'after': paid[0].pk}).json()
+        self.assertEqual([row['id'] for row in second['entries']], [backdated.pk, paid[1].pk])
+        self.assertEqual((second['opening_balance'], second['entries'][-1]['paid_to_date'], second['next']), (900, 205, paid[1].pk))
+
+        statement = b''.join(self.client.get(f'/api/properties/payment-plans/{self.plan.pk}/statement/').streaming_content).decode().splitlines()
+        self.assertEqual([line.split(',')[5] for line in statement[1:]], ['0.00', '100.00', '105.00', '205.00', '305.00'])
+
+    def test_each_plan_is_updated_once_per_batch(self):
+        with CaptureQueriesContext(connection) as captured:
+            archive_payments()
+        plan_updates = [q['sql'] for q in captured.captured_queries if q['sql'].startswith('UPDATE "properties_paymentplan"')]
+        self.assertEqual(len(plan_updates), 1)
+
+    def test_ranges_reaching_back_read_the_archive_straight_away(self):
+        start = timezone.now() - timedelta(days=500)
+        # The horizon is read before anything is archived, as a busy worker would have
+        self.assertIsNone(payments_in_range(start)[1])
+        archive_payments()
+
+        hot, archived = payments_in_range(start)
+        self.assertEqual((hot.count(), archived.count()), (2, 3))
+        data = self.client.get('/api/properties/payments-list/', {'from': start.date().isoformat()}).json()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['id'], self.recent.pk)
+        self.assertEqual(len(self.client.get('/api/properties/payments-list/').json()), 2)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        settings_override = override_settings(SNAPSHOT_ROOT=self.root, SNAPSHOT_PAGE_SIZE=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for i in range(3):
+            Property.objects.create(title=f'Home {i}', listing_type='House')
+        self.client = APIClient()
+
+    def test_listing_is_served_from_the_snapshot(self):
+        version = snapshots.build_snapshots()
+        response = self.client.get('/api/properties/listings/listing_type-House/2/')
+
+        self.assertEqual(response['ETag'], f'"v{version}"')
+        page = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((page['count'], page['num_pages'], len(page['results'])), (3, 2, 1))
+
+    def test_gzip_and_identity_have_their_own_etags(self):
+        version = snapshots.build_snapshots()
+        plain = self.client.get('/api/properties/')
+        zipped = self.client.get('/api/properties/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(zipped['ETag'], f'"v{version}-gz"')
+        self.assertNotEqual(plain['ETag'], zipped['ETag'])
+        self.assertEqual(gzip.decompress(b''.join(zipped.streaming_content)), b''.join(plain.streaming_content))
+        self.assertEqual(self.client.get('/api/properties/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=f'"v{version}-gz"').status_code, 304)
+        self.assertEqual(self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=f'"v{version}-gz"').status_code, 200)
+
+    def test_failed_build_leaves_no_staging_directory(self):
+        previous = snapshots.build_snapshots()
+        with mock.patch('properties.snapshots.write_file', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                snapshots.build_snapshots()
+
+        self.assertFalse([name for name in os.listdir(self.root) if name.startswith('.v')])
+        self.assertEqual(snapshots.snapshot_file('all/full.json')[1], f'v{previous}')
+
+
+class MultiGetAndBatchTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('other')
+        self.plans = [make_plan(self.user, title='Mine'), make_plan(self.other, title='Theirs')]
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_ids_multi_get_keeps_the_requested_order(self):
+        first, second = (plan.property for plan in self.plans)
+        response = self.client.get('/api/properties/', {'ids': f'{second.pk},999,{first.pk},{second.pk}'})
+
+        self.assertEqual([row['id'] for row in response.json()], [second.pk, first.pk])
+        self.assertEqual(self.client.get('/api/properties/', {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/', {'ids': '99999999999999999999999'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/payment-plan-list/', {'ids': f'1,{2 ** 63}'}).status_code, 400)
+
+    def test_payment_plan_multi_get_only_returns_own_plans(self):
+        ids = ','.join(str(plan.pk) for plan in self.plans)
+        response = self.client.get('/api/properties/payment-plan-list/', {'ids': ids})
+        self.assertEqual([row['id'] for row in response.json()], [self.plans[0].pk])
+
+    def test_batch_runs_each_operation_and_isolates_failures(self):
+        property_id = self.plans[0].property.pk
+        response = self.client.post('/api/properties/batch/', {'requests': [
+            {'path': f'/api/properties/{property_id}/'},
+            {'path': f'/api/properties/user-list/{self.user.pk}/'},
+            {'path': '/api/properties/payment-plan-list/?ids=' + str(self.plans[0].pk)},
+            {'path': '/api/properties/batch/'},
+            {'method': 'POST', 'path': '/api/properties/'},
+            {'path': '/api/properties/nowhere/'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['responses']
+        self.assertEqual([result['status'] for result in results], [200, 500, 200, 400, 405, 404])
+        self.assertEqual(results[0]['body']['id'], property_id)
+        self.assertEqual([row['id'] for row in results[2]['body']], [self.plans[0].pk])
+
+    def test_token_is_looked_up_once_per_batch(self):
+        paths = [{'path': f'/api/properties/payment-plan-list/?ids={plan.pk}'} for plan in self.plans]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/properties/batch/', {'requests': paths}, format='json')
+
+        self.assertEqual([result['status'] for result in response.json()['responses']], [200, 200])
+        self.assertEqual(sum('"authtoken_token"' in q['sql'] for q in captured.captured_queries), 1)
+
+    def test_batch_parts_need_the_callers_credentials(self):
+        response = APIClient().post('/api/properties/batch/', {'requests': [{'path': '/api/properties/report-summary/'}]}, format='json')
+        self.assertEqual(response.json()['responses'][0]['status'], 401)
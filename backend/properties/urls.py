@@ -1,7 +1,6 @@
 from django.urls import path, include
 from . import views
-from .views import PropertyUploadView, edit_property, PaymentPlanView, PaymentViewSet, UserPaymentPlansView, PaymentByProperties
-from djoser.views import UserViewSet
+from .views import PropertyUploadView, edit_property, PaymentPlanView, PaymentViewSet, UserPaymentPlansView, PaymentByProperties, UserViewSet
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import DefaultRouter
 
@@ -13,11 +12,15 @@ router.register(r'payments', PaymentViewSet)
 
 urlpatterns = [
     path('', views.property_list, name='property_list'),
+    path('listings/<slug:filter_set>/<int:page>/', views.listing_page, name='listing_page'),
     path('edit-property/<int:pk>/', views.edit_property, name='edit_property'),
     path('<int:pk>/delete/', views.delete_property, name='delete_property'),
     # path('all-properties/', views.PropertyListView.as_view(), name='property-list'),
     path('<int:pk>/', views.property_detail, name='property_detail'),
+    path('<int:pk>/similar/', views.similar_properties, name='similar_properties'),
     path('upload-property/', PropertyUploadView.as_view(), name='upload-property'),
+    path('sync/', views.sync, name='sync'),
+    path('batch/', views.batch, name='batch'),
 
     # Authentication
     path('api/auth/token/', obtain_auth_token, name='auth-token'), # or logging in a user and receiving an authentication token.
@@ -33,11 +36,15 @@ urlpatterns = [
     path('payment-plan-list/', views.PaymentPlanView.as_view()),
     path('payment-plans/<int:plan_id>/make-payment/', views.make_payment, name='make-payment'),
     path('payment-plans/<int:plan_id>/', views.PaymentPlanView.as_view(), name='make-payment'),
+    path('payment-plans/<int:plan_id>/ledger/', views.PaymentPlanLedgerView.as_view(), name='payment-plan-ledger'),
+    path('payment-plans/<int:plan_id>/statement/', views.payment_plan_statement, name='payment-plan-statement'),
     path('payments-list/', views.PaymentView.as_view()),
     path('payments/payment-plans/user/<int:pk>/', views.UserPaymentPlansView.as_view(), name='user-payment-plans'),
     path('payments/payments-by-property/<int:property_id>/', views.PaymentByProperties.as_view(), name='payments-by-property'),
     # path('payments/property/<int:property_id>/', ),
 
+    path('deletion-jobs/<int:pk>/', views.deletion_job, name='deletion-job'),
+
     # Reports
     path('report-summary/', views.report_summary, name='report-summary'),
 
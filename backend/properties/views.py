@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
@@ -5,13 +7,26 @@ from rest_framework import status, viewsets, permissions
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
+from djoser.views import UserViewSet as DjoserUserViewSet
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import PasswordResetForm
 from decimal import Decimal, InvalidOperation
-from django.db.models import Sum, Count
-
-from .models import Property, User, PaymentPlan, Payment
-from .serializers import PropertySerializer, UserRegisterSerializer, UserLoginSerializer, PaymentPlanSerializer, UserSerializer, PaymentSerializer
+from django.db import transaction
+from django.db.models import Sum, Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import heapq
+
+from .models import Property, User, PaymentPlan, Payment, ArchivedPayment, Tombstone, DeletionJob
+from .archive import payments_in_range
+from .deletion import schedule_deletion, exclude_scheduled_users
+from .similarity import index as similarity_index
+from .ledger import ledger_page, statement_csv
+from .snapshots import snapshot_file, filter_sets, listing_queryset, page_payload
+from .serializers import PropertySerializer, UserRegisterSerializer, UserLoginSerializer, PaymentPlanSerializer, UserSerializer, PaymentSerializer, ArchivedPaymentSerializer, DeletionJobSerializer
+from .idempotency import IDEMPOTENCY_HEADER, get_stored_response, claim_key, record_response, request_fingerprint, purge_expired_keys
+from .batch import run_batch
 
 
 # USER REGISTRATION VIEW
@@ -44,15 +59,162 @@ def login_user(request):
 
 
 
+def requested_ids(request):
+    # ?ids=1,2,3 as a list of ints, None when not given; raises ValueError when malformed or too long
+    ids = request.query_params.get('ids')
+    if ids is None:
+        return None
+    ids = [int(i) for i in ids.split(',') if i.strip()]
+    if len(ids) > getattr(settings, 'MULTI_GET_MAX_IDS', 100):
+        raise ValueError
+    # Primary keys are 64-bit; larger values overflow in the database driver
+    if any(not -2 ** 63 <= i < 2 ** 63 for i in ids):
+        raise ValueError
+    return ids
+
+
+def bad_ids_response():
+    limit = getattr(settings, 'MULTI_GET_MAX_IDS', 100)
+    return Response({"error": f"ids must be a comma separated list of at most {limit} ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def snapshot_response(request, name):
+    # Serves a pre-rendered listing file, gzipped when the client accepts it; None if it is not built yet
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    snapshot = snapshot_file(name, gzipped=gzipped)
+    if snapshot is None:
+        return None
+
+    path, version = snapshot
+    # The two encodings are different bytes, so they cannot share a strong ETag
+    etag = f'"{version}-gz"' if gzipped else f'"{version}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        return HttpResponseNotModified()
+    response = FileResponse(open(path, 'rb'), content_type='application/json')
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'public, max-age=%d' % getattr(settings, 'SNAPSHOT_DEBOUNCE', 5)
+    return response
+
+
 # PUBLIC FUNCTION BASED VIEW
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def property_list(request):
+    # ?ids= fetches several properties in one query, in the order asked for
+    try:
+        ids = requested_ids(request)
+    except ValueError:
+        return bad_ids_response()
+    if ids is not None:
+        found = Property.objects.in_bulk(ids)
+        serializer = PropertySerializer([found[i] for i in dict.fromkeys(ids) if i in found], many=True)
+        return Response(serializer.data)
+
+    snapshot = snapshot_response(request, 'all/full.json')
+    if snapshot is not None:
+        return snapshot
     properties = Property.objects.all().order_by('-date_posted')
     serializer = PropertySerializer(properties, many=True)
     return Response(serializer.data)
 
 
+# PAGED PUBLIC LISTING, e.g. listings/all/1/ or listings/listing_type-House/2/
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def listing_page(request, filter_set, page):
+    filters = {name: (field, value) for name, field, value in filter_sets()}
+    if filter_set not in filters or page < 1:
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    snapshot = snapshot_response(request, f'{filter_set}/page-{page}.json')
+    if snapshot is not None:
+        return snapshot
+
+    # No snapshot yet, render the same page dynamically
+    field, value = filters[filter_set]
+    properties = listing_queryset()
+    if field is not None:
+        properties = properties.filter(**{field: value})
+    page_size = getattr(settings, 'SNAPSHOT_PAGE_SIZE', 50)
+    count = properties.count()
+    if page > 1 and (page - 1) * page_size >= count:
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    results = PropertySerializer(properties[(page - 1) * page_size:page * page_size], many=True).data
+    return Response(page_payload(None, results, page, page_size, count))
+
+
+# DELTA SYNC VIEW
+# GET sync/ returns everything plus a cursor, GET sync/?since=<cursor> only what changed after it
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def sync(request):
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = parse_datetime(since)
+        except ValueError:
+            since = None
+        if since is None or timezone.is_naive(since):
+            return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # updated_at is stamped before the writing transaction commits, so the cursor trails the
+    # clock; rows changed inside the lag window are sent again next time rather than missed
+    cursor = timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_CURSOR_LAG', 30))
+
+    properties = Property.objects.all()
+    property_tombstones = Tombstone.objects.filter(model_name='property')
+
+    if request.user.is_authenticated:
+        payment_plans = PaymentPlan.objects.select_related('property')
+        plan_tombstones = Tombstone.objects.filter(model_name='paymentplan')
+        if not request.user.is_staff:
+            payment_plans = payment_plans.filter(user=request.user)
+            plan_tombstones = plan_tombstones.filter(user_id=request.user.id)
+    else:
+        payment_plans = PaymentPlan.objects.none()
+        plan_tombstones = Tombstone.objects.none()
+
+    if since:
+        properties = properties.filter(updated_at__gt=since)
+        payment_plans = payment_plans.filter(updated_at__gt=since)
+        property_tombstones = property_tombstones.filter(deleted_at__gt=since)
+        plan_tombstones = plan_tombstones.filter(deleted_at__gt=since)
+    else:
+        # A full sync has nothing to delete on the client
+        property_tombstones = property_tombstones.none()
+        plan_tombstones = plan_tombstones.none()
+
+    return Response({
+        "cursor": cursor.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "properties": {
+            "updated": PropertySerializer(properties, many=True).data,
+            "deleted": list(property_tombstones.values_list('object_id', flat=True)),
+        },
+        "payment_plans": {
+            "updated": PaymentPlanSerializer(payment_plans, many=True, context={'request': request}).data,
+            "deleted": list(plan_tombstones.values_list('object_id', flat=True)),
+        },
+    })
+
+
+# BATCH VIEW
+# POST {"requests": [{"method": "GET", "path": "/api/properties/1/"}, ...]} runs them all in one round trip
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch(request):
+    operations = request.data.get('requests') if isinstance(request.data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return Response({"error": "requests must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > getattr(settings, 'BATCH_MAX_REQUESTS', 20):
+        return Response({"error": "Too many requests in one batch."}, status=status.HTTP_400_BAD_REQUEST)
+
+    prefix = request.path[:-len('batch/')]
+    return Response({"responses": run_batch(request, operations, prefix)})
+
+
 # USER LOGOUT VIEW
 @api_view(['POST'])
 def logout_user(request):
@@ -78,18 +240,34 @@ class PaymentPlanView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        payment_plans = PaymentPlan.objects.all().order_by('-created_at')
+        try:
+            ids = requested_ids(request)
+        except ValueError:
+            return bad_ids_response()
+        if ids is not None:
+            # Multi-get: one query for all the plans, limited to the user's own unless staff
+            payment_plans = PaymentPlan.objects.select_related('property')
+            if not request.user.is_staff:
+                payment_plans = payment_plans.filter(user=request.user)
+            found = payment_plans.in_bulk(ids)
+            payment_plans = [found[i] for i in dict.fromkeys(ids) if i in found]
+        else:
+            payment_plans = PaymentPlan.objects.all().order_by('-created_at')
         serializer = PaymentPlanSerializer(payment_plans, many=True, context={'request' : request})
         return Response(serializer.data)
     
     def delete(self, request, plan_id=None, *args, **kwargs):
         try:
             plan = PaymentPlan.objects.get(pk=plan_id)
-            plan.delete()
-            return Response({'detail': 'Payment plan deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
         except PaymentPlan.DoesNotExist:
             return Response({'error': 'Payment plan not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+        if settings.ASYNC_DELETION:
+            job = schedule_deletion(plan)
+            return Response({'detail': 'Payment plan scheduled for deletion.', 'job': job.pk}, status=status.HTTP_202_ACCEPTED)
+        plan.delete()
+        return Response({'detail': 'Payment plan deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
 
 class UserPaymentPlansView(APIView):
     permission_classes = [IsAuthenticated]
@@ -104,60 +282,212 @@ class UserPaymentPlansView(APIView):
         return Response(serializer.data)
 
 
+def date_range(params):
+    # ?from=YYYY-MM-DD&to=YYYY-MM-DD as aware datetimes, `to` inclusive of the whole day
+    start = end = None
+    if params.get('from'):
+        start = timezone.make_aware(datetime.combine(parse_date(params['from']), time.min))
+    if params.get('to'):
+        end = timezone.make_aware(datetime.combine(parse_date(params['to']) + timedelta(days=1), time.min))
+    return start, end
+
+
+def payment_list_data(hot, archived, context=None):
+    # Newest first; archived payments are only present when the requested range reached them
+    hot = list(hot.order_by('-payment_date'))
+    pairs = zip(hot, PaymentSerializer(hot, many=True, context=context).data)
+    if archived is not None:
+        archived = list(archived.order_by('-payment_date'))
+        archived_pairs = zip(archived, ArchivedPaymentSerializer(archived, many=True, context=context).data)
+        pairs = heapq.merge(pairs, archived_pairs, key=lambda pair: pair[0].payment_date, reverse=True)
+    return [data for _, data in pairs]
+
+
+class PaymentPlanLedgerView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # GET ?from=YYYY-MM-DD&to=YYYY-MM-DD&after=<payment id>&page_size=50
+    def get(self, request, plan_id):
+        plan = get_object_or_404(PaymentPlan, pk=plan_id)
+        if request.user.id != plan.user_id and not request.user.is_staff:
+            return Response({'error': 'Unauthorized access.'}, status=403)
+
+        params = request.query_params
+        try:
+            page_size = max(1, min(int(params.get('page_size', 50)), 500))
+        except ValueError:
+            return Response({'error': 'Invalid page_size.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start, end = date_range(params)
+        except (TypeError, ValueError):
+            return Response({'error': 'Dates must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        after = None
+        if params.get('after'):
+            try:
+                after_id = int(params['after'])
+            except ValueError:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+            after = (
+                Payment.objects.filter(payment_plan=plan, pk=after_id).only('id', 'payment_date').first()
+                or ArchivedPayment.objects.filter(payment_plan=plan, pk=after_id).only('id', 'payment_date').first()
+            )
+            if after is None:
+                return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = ledger_page(plan, after=after, start=start, end=end, page_size=page_size)
+        return Response({
+            'plan': plan.pk,
+            'total_amount': plan.total_amount,
+            **page,
+        })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def payment_plan_statement(request, plan_id):
+    plan = get_object_or_404(PaymentPlan, pk=plan_id)
+    if request.user.id != plan.user_id and not request.user.is_staff:
+        return Response({'error': 'Unauthorized access.'}, status=403)
+
+    response = StreamingHttpResponse(statement_csv(plan), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="statement-{plan.pk}.csv"'
+    return response
+
+
 class PaymentByProperties(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, property_id):
-        payments = Payment.objects.filter(payment_plan__property__id=property_id, status='successful')
-        serializer = PaymentSerializer(payments, many=True)
-        return Response(serializer.data)
+        try:
+            start, end = date_range(request.query_params)
+        except (TypeError, ValueError):
+            return Response({'error': 'Dates must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        hot, archived = payments_in_range(start, end, payment_plan__property__id=property_id, payment_plan__deleted_at__isnull=True, status='successful')
+        return Response(payment_list_data(hot, archived))
 
 
 class PaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        payments = Payment.objects.all().order_by('-payment_date')
-        serializer = PaymentSerializer(payments, many=True, context={'request': request})
-        return Response(serializer.data)
+        try:
+            start, end = date_range(request.query_params)
+        except (TypeError, ValueError):
+            return Response({'error': 'Dates must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Payments of plans waiting for background deletion are hidden with their plan
+        hot, archived = payments_in_range(start, end, payment_plan__deleted_at__isnull=True)
+        return Response(payment_list_data(hot, archived, context={'request': request}))
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
-    queryset = Payment.objects.all().order_by('-payment_date')
+    queryset = Payment.objects.filter(payment_plan__deleted_at__isnull=True).order_by('-payment_date')
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    # Listing accepts ?from=&to= and reads the archive when `from` reaches into it
+    def list(self, request, *args, **kwargs):
+        try:
+            start, end = date_range(request.query_params)
+        except (TypeError, ValueError):
+            return Response({'error': 'Dates must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        hot, archived = payments_in_range(start, end, payment_plan__deleted_at__isnull=True)
+        return Response(payment_list_data(hot, archived, context=self.get_serializer_context()))
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def make_payment(request, plan_id):
-    payment_plan = get_object_or_404(PaymentPlan, pk=plan_id)
     amount = request.data.get('amount')
     try:
         amount = Decimal(str(amount))
-    except (TypeError, ValueError):
+    except (TypeError, ValueError, InvalidOperation):
+        return Response({"error": "Invalid amount."}, status=status.HTTP_400_BAD_REQUEST)
+    if not amount.is_finite():
         return Response({"error": "Invalid amount."}, status=status.HTTP_400_BAD_REQUEST)
     
     if amount <= 0:
         return Response({"error": "Amount must be greater than 0."}, status=status.HTTP_400_BAD_REQUEST)
-    
-    if payment_plan.amount_paid + amount > payment_plan.total_amount:
-        return Response({"error": "Payment exceeds total amount."}, status=status.HTTP_400_BAD_REQUEST)
-    
-    payment = Payment.objects.create(
-        payment_plan=payment_plan,
-        amount=amount,
-        method=request.data.get('method', 'bank_transfer'),
-        reference=request.data.get('reference', ''),
-        status='successful'
-    )
 
-    payment_plan.amount_paid += amount
-    payment_plan.save()
+    method = request.data.get('method', 'bank_transfer')
+    reference = request.data.get('reference', '')
+    fingerprint = request_fingerprint(amount, method, reference)
+
+    # Retries carrying the same Idempotency-Key get the original response replayed
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    if idempotency_key:
+        stored = get_stored_response(request.user, idempotency_key)
+        if stored is not None:
+            return replay_response(stored, plan_id, fingerprint)
+
+    # Resends are answered without taking the plan row lock
+    if reference:
+        resent = resent_payment_response(get_object_or_404(PaymentPlan, pk=plan_id), reference, amount)
+        if resent is not None:
+            return resent
+
+    with transaction.atomic():
+        payment_plan = get_object_or_404(PaymentPlan.objects.select_for_update(), pk=plan_id)
+
+        # Checked again under the lock for a resend that raced the check above
+        if reference:
+            resent = resent_payment_response(payment_plan, reference, amount)
+            if resent is not None:
+                return resent
+
+        if payment_plan.amount_paid + amount > payment_plan.total_amount:
+            return Response({"error": "Payment exceeds total amount."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # The key is claimed before the payment exists, so of two concurrent retries only one gets to pay
+        claim = None
+        if idempotency_key:
+            claim = claim_key(request.user, idempotency_key, payment_plan, fingerprint)
+            if claim is None:
+                stored = get_stored_response(request.user, idempotency_key)
+                if stored is None:
+                    return Response({"error": "A request with this Idempotency-Key is already in progress."}, status=status.HTTP_409_CONFLICT)
+                return replay_response(stored, plan_id, fingerprint)
+
+        # Payment.save() recalculates and saves payment_plan.amount_paid
+        Payment.objects.create(
+            payment_plan=payment_plan,
+            amount=amount,
+            method=method,
+            reference=reference,
+            status='successful'
+        )
+
+        response_body = {
+            "message": "Payment successful.",
+            "new_balance": payment_plan.balance()
+        }
+        if claim is not None:
+            record_response(claim, status.HTTP_200_OK, response_body)
+
+    if claim is not None:
+        purge_expired_keys()
+    return Response(response_body, status=status.HTTP_200_OK)
+
+
+def replay_response(stored, plan_id, fingerprint):
+    if stored.payment_plan_id != plan_id:
+        return Response({"error": "Idempotency-Key was already used for another payment plan."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    # Keys stored before fingerprints were recorded have none to compare
+    if stored.request_fingerprint and stored.request_fingerprint != fingerprint:
+        return Response({"error": "Idempotency-Key was already used for a different payment."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(stored.response_body, status=stored.response_status)
+
+
+def resent_payment_response(payment_plan, reference, amount):
+    # A payment with the same reference on this plan is a resend of one already recorded, if the amount matches
+    previous = Payment.objects.filter(payment_plan=payment_plan, reference=reference).exclude(status='failed').only('amount').first()
+    if previous is None:
+        return None
+    if previous.amount != amount:
+        return Response({"error": "Reference was already used for a payment of a different amount."}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
     return Response({
         "message": "Payment successful.",
-        "new_balance": payment_plan.total_amount - payment_plan.amount_paid
+        "new_balance": payment_plan.balance()
     }, status=status.HTTP_200_OK)
 
 
@@ -169,6 +499,25 @@ def property_detail(request, pk):
     return Response(serializer.data)
 
 
+# Comparable listings, nearest first, from the in-memory feature index
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_properties(request, pk):
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response({"error": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = similarity_index.similar(pk, limit)
+    if matches is None:
+        return Response({"detail": "Property not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    properties = Property.objects.in_bulk([property_id for property_id, _ in matches])
+    ordered = [properties[property_id] for property_id, _ in matches if property_id in properties]
+    serializer = PropertySerializer(ordered, many=True)
+    return Response(serializer.data)
+
+
 # CLASS-BASED VIEW: PUBLIC LIST
 # class PropertyListView(APIView):
 #     permission_classes = [AllowAny]
@@ -207,14 +556,31 @@ class MakePayment(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
+class UserViewSet(DjoserUserViewSet):
+    # djoser's user endpoints, without users waiting for background deletion
+    def get_queryset(self):
+        return exclude_scheduled_users(super().get_queryset())
+
+
 class UsersList(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        users = User.objects.all().order_by('-date_joined')
+        users = exclude_scheduled_users(User.objects.all()).order_by('-date_joined')
         serializer = UserSerializer(users, many=True, context={'request': request})
         return Response(serializer.data)
 
+    def delete(self, request, pk=None):
+        if not request.user.is_staff:
+            return Response({'error': 'Unauthorized access.'}, status=403)
+
+        user = get_object_or_404(User, pk=pk, is_active=True)
+        if settings.ASYNC_DELETION:
+            job = schedule_deletion(user)
+            return Response({'detail': 'User scheduled for deletion.', 'job': job.pk}, status=status.HTTP_202_ACCEPTED)
+        user.delete()
+        return Response({'detail': 'User deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
 
 # CLASS-BASED VIEW: PROTECTED UPLOAD
 class PropertyUploadView(APIView):
@@ -251,23 +617,52 @@ def edit_property(request, pk):
 def delete_property(request, pk):
     property_obj = get_object_or_404(Property, pk=pk)
 
+    # Payments hanging off the property are removed in chunks in the background
+    if settings.ASYNC_DELETION:
+        job = schedule_deletion(property_obj)
+        return Response({"message": "Property scheduled for deletion.", "job": job.pk}, status=status.HTTP_202_ACCEPTED)
     property_obj.delete()
     return Response({"message": "Property deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def deletion_job(request, pk):
+    if not request.user.is_staff:
+        return Response({'error': 'Unauthorized access.'}, status=403)
+
+    job = get_object_or_404(DeletionJob, pk=pk)
+    serializer = DeletionJobSerializer(job)
+    return Response(serializer.data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def report_summary(request):
     total_properties = Property.objects.count()
     total_plans = PaymentPlan.objects.count()
     total_users = User.objects.count()
-    total_amount_paid = Payment.objects.filter(status='successful').aggregate(total=Sum('amount'))['total'] or 0
+    # Payments of plans waiting for background deletion are left out with their plan
+    payments = Payment.objects.filter(payment_plan__deleted_at__isnull=True)
+    hot = payments.aggregate(
+        paid=Sum('amount', filter=Q(status='successful')),
+        successful=Count('id', filter=Q(status='successful')),
+        pending=Count('id', filter=Q(status='pending')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    # Archived payments are already totalled and counted per plan, so the archive itself is not read
+    archived = PaymentPlan.objects.aggregate(
+        paid=Sum('archived_paid'),
+        successful=Sum('archived_successful_count'),
+        failed=Sum('archived_failed_count'),
+    )
+    total_amount_paid = (hot['paid'] or 0) + (archived['paid'] or 0)
 
-    successful_count = Payment.objects.filter(status='successful').count()
-    pending_count = Payment.objects.filter(status='pending').count()
-    failed_count = Payment.objects.filter(status='failed').count()
+    successful_count = hot['successful'] + (archived['successful'] or 0)
+    pending_count = hot['pending']
+    failed_count = hot['failed'] + (archived['failed'] or 0)
 
-    recent_payments = Payment.objects.select_related('payment_plan').order_by('-payment_date')[:10]
+    recent_payments = payments.select_related('payment_plan').order_by('-payment_date')[:10]
     recent_data = [
         {
             "user": payment.payment_plan.user.username if hasattr(payment.payment_plan, 'user') else 'N/A',